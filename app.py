@@ -1,8 +1,11 @@
 import streamlit as st
-import pandas as pd
 import os
-import json
 from PIL import Image
+import catalog_store
+import thumbnails
+import image_store
+import search_index
+from pricing import DIM_COLUMNS
 
 # ==========================================
 # 1. 网页基础设置
@@ -46,16 +49,31 @@ st.markdown("""
 # 2. 核心功能函数
 # ==========================================
 
-@st.cache_data
 def load_data():
-    if not os.path.exists('product_database_master.csv'):
+    # 与 start.py 共用商品库及缓存: 库文件变化后自动重新载入
+    df = catalog_store.load_catalog()
+    if df.empty:
         return None
-    df = pd.read_csv('product_database_master.csv')
-    df = df.fillna(0) # 填充空值为0
     return df
 
+st.session_state.catalog_version = catalog_store.version()
 df = load_data()
 
+GALLERY_PAGE_SIZES = [12, 24, 48, 96]
+CATALOG_POLL_SECONDS = 5
+
+@st.fragment(run_every=CATALOG_POLL_SECONDS)
+def watch_catalog():
+    # 工作站 (start.py) 或脚本改了商品库时, 本页自动刷新
+    if catalog_store.version() != st.session_state.catalog_version:
+        st.rerun(scope="app")
+
+watch_catalog()
+
+@st.cache_resource
+def get_search_index():
+    return search_index.SearchIndex()
+
 def fix_image_path(raw_path):
     path_str = str(raw_path)
     clean_path = path_str.replace("\\", "/")
@@ -69,7 +87,7 @@ def fix_image_path(raw_path):
 # ==========================================
 
 if df is None:
-    st.error("❌ 找不到数据文件，请检查 product_database_master.csv")
+    st.error("❌ 商品库为空，请检查 product_database_master.csv / product_database_master.db")
 else:
     # --- 侧边栏：全局参数 (还原图3左侧) ---
     with st.sidebar:
@@ -93,8 +111,6 @@ else:
         'price': '真实售价',
         'cost': '进货价',
         'weight': '重量',
-        'size': '包装尺寸(cm)',
-        'sku_json': 'SKU配置',
         'desc': '文案'
     }
 
@@ -121,7 +137,7 @@ else:
             st.subheader("🖼️ 商品主图")
             final_path = fix_image_path(p_data[col_map['img']])
             if os.path.exists(final_path):
-                st.image(final_path, use_container_width=True)
+                st.image(image_store.best_image(final_path, 800), use_container_width=True)
             else:
                 st.warning("图片未找到")
 
@@ -141,15 +157,9 @@ else:
             c5, c6 = st.columns(2)
             target_margin = c5.number_input("目标利润率 (%)", value=15.0)
             
-            # 第四行：包装尺寸 (尝试解析 0.0x0.0x0.0)
+            # 第四行：包装尺寸 (载入时已拆成 长/宽/高 三列)
             st.caption("📦 包装尺寸 (cm)")
-            size_str = str(p_data.get(col_map['size'], "0x0x0"))
-            try:
-                # 简单的分割逻辑，如果格式不对就默认0
-                dims = size_str.lower().split('x') if 'x' in size_str else [0,0,0]
-                if len(dims) != 3: dims = [0,0,0]
-            except:
-                dims = [0,0,0]
+            dims = [f"{p_data.get(c, 0.0):g}" for c in DIM_COLUMNS]
                 
             cc1, cc2, cc3 = st.columns(3)
             l = cc1.text_input("长", value=dims[0])
@@ -166,13 +176,8 @@ else:
         # 4. SKU 变体定价 (核心难点！还原图2)
         st.subheader("🛍️ SKU 变体定价")
         
-        # 解析 JSON
-        sku_json_str = str(p_data.get(col_map['sku_json'], "[]"))
-        try:
-            sku_list = json.loads(sku_json_str)
-        except:
-            sku_list = []
-            st.error("⚠️ 该商品 SKU 数据格式有误，无法解析。")
+        # SKU 存于独立的 skus 表 (按商品 id 读取)
+        sku_list = catalog_store.load_skus(p_data.name)
 
         if not sku_list:
             st.info("此商品没有配置多 SKU 变体信息。")
@@ -236,18 +241,27 @@ else:
         st.title("🛒 商品选品主页")
         search_term = st.text_input("🔍 搜索...", "")
         if search_term:
-            filtered_df = df[df[col_map['name']].astype(str).str.contains(search_term, case=False, na=False)]
+            # 倒排索引按 (库路径, 目录版本) 增量同步, 结果按相关度排序
+            index = get_search_index()
+            index.sync(df[col_map['name']], version=(os.path.abspath(catalog_store.CATALOG_DB_FILE), catalog_store.version()))
+            filtered_df = df.loc[index.search(search_term)]
         else:
             filtered_df = df
             
+        # 分页: 每次只渲染当前页, 图片走缩略图缓存
+        c_size, c_page, c_info = st.columns([1, 1, 2])
+        page_size = c_size.selectbox("每页数量", GALLERY_PAGE_SIZES, index=1)
+        total_pages = max(1, -(-len(filtered_df) // page_size))
+        page_no = c_page.number_input("页码", min_value=1, max_value=total_pages, value=1, step=1)
+        c_info.caption(f"共 {len(filtered_df)} 件商品 · 第 {page_no}/{total_pages} 页")
+        page_df = filtered_df.iloc[(page_no - 1) * page_size : page_no * page_size]
+
         cols = st.columns(4) # 4列更紧凑
-        for index, row in filtered_df.iterrows():
-            with cols[index % 4]:
+        for pos, (index, row) in enumerate(page_df.iterrows()):
+            with cols[pos % 4]:
                 with st.container(border=True):
-                    final_path = fix_image_path(row[col_map['img']])
-                    if os.path.exists(final_path):
-                        st.image(final_path, use_container_width=True)
+                    thumb = thumbnails.thumbnail_path(fix_image_path(row[col_map['img']]), thumbnails.CARD_SIZE)
+                    if thumb:
+                        st.image(thumb, use_container_width=True)
                     st.caption(row[col_map['name']])
                     st.markdown(f"**¥{row[col_map['cost']]}**")
-
-
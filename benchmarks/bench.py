@@ -0,0 +1,165 @@
+import os
+import sys
+import json
+import time
+import shutil
+import random
+import platform
+import argparse
+import statistics
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import catalog_store
+import thumbnails
+import image_store
+from pricing import get_ship_cost_cny, calculate_sku_variant, price_catalog, channel_names
+import synth_catalog
+
+# === 基准测试: 吞吐量 + 峰值内存, 与 baseline.json 比较 ===
+# 例: python benchmarks/bench.py                     (1k / 10k, 超过阈值则退出码 1)
+#     python benchmarks/bench.py --sizes 1000,10000,100000
+#     python benchmarks/bench.py --save-baseline     (换机器 / 确认的性能变化后重新记录)
+DATA_DIR = os.path.join(ROOT, ".cache", "bench")
+BASELINE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+TIME_TOLERANCE = 0.5      # 比基线慢 50% 以上算退化 (计时噪声较大)
+MEM_TOLERANCE = 0.25      # 峰值内存多 25% 以上算退化
+TIME_FLOOR = 0.005        # 绝对差小于 5ms 时忽略
+MEM_FLOOR_MB = 1.0
+N_IMAGES = 50
+N_SCALAR = 2000
+
+def measure(fn, setup=None, repeat=5, items=1):
+    # 计时与内存分开跑, tracemalloc 本身会拖慢计时
+    times = []
+    for _ in range(repeat):
+        if setup: setup()
+        t = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - t)
+    if setup: setup()
+    tracemalloc.start()
+    fn()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    sec = statistics.median(times)
+    return {"seconds": round(sec, 6), "per_sec": round(items / sec, 1) if sec else float("inf"), "peak_mb": round(peak / 2**20, 3), "items": items}
+
+# === 1. 各场景 ===
+def _reset_db(db):
+    for p in (db, db + "-wal", db + "-shm"):
+        if os.path.exists(p): os.remove(p)
+    catalog_store._initialized.discard(os.path.abspath(db))
+    catalog_store._cache.clear()
+
+def _reset_thumbs(folder, variants):
+    # 冷启动: 缩略图缓存和入库时生成的 WebP 尺寸图都要清掉, 否则测到的是尺寸图命中
+    shutil.rmtree(folder, ignore_errors=True)
+    shutil.rmtree(variants, ignore_errors=True)
+    thumbnails.THUMB_DIR = folder
+    thumbnails._mem.clear()
+    thumbnails._disk_bytes = None
+
+def bench_size(n, repeat):
+    out_dir = os.path.join(DATA_DIR, str(n))
+    csv_path = synth_catalog.build(out_dir, n, n_images=max(N_IMAGES, 200))
+    os.chdir(out_dir)   # 图片路径相对商品库目录
+    db = os.path.join(out_dir, "bench.db")
+    results = {}
+    results["migrate_csv"] = measure(lambda: catalog_store.connect(db, csv_path).close(), lambda: _reset_db(db),
+                                     repeat=1 if n > 10000 else 3, items=n)
+
+    results["load_data.cold"] = measure(lambda: catalog_store.load_catalog(db), catalog_store._cache.clear, repeat, items=n)
+    results["load_data.warm"] = measure(lambda: catalog_store.load_catalog(db), repeat=repeat, items=n)
+    results["load_sku_frame.cold"] = measure(lambda: catalog_store.load_sku_frame(db), catalog_store._cache.clear, repeat, items=n)
+
+    df = catalog_store.load_catalog(db)
+    skus = catalog_store.load_sku_frame(db)
+    ids = [int(i) for i in df.index[:50]]
+    sku_list = catalog_store.load_skus(ids[0], db)
+    def save_rows():
+        for pid in ids: catalog_store.update_product(pid, {"备注": "bench", "真实售价": 19.9}, skus=sku_list, db_path=db)
+    results["save_data.update_product"] = measure(save_rows, repeat=repeat, items=len(ids))
+    updates = {int(pid): {"真实售价": 19.9, "硬成本(RMB)": 42.0} for pid in df.index}
+    results["save_data.update_many"] = measure(lambda: catalog_store.update_many(updates, db), repeat=repeat, items=n)
+    export = os.path.join(out_dir, "export.csv")
+    results["save_data.export_csv"] = measure(lambda: catalog_store.export_csv(export, db), repeat=max(repeat // 2, 1), items=n)
+
+    paths = list(dict.fromkeys(df["图片路径"]))[:N_IMAGES]
+    thumbs = os.path.join(out_dir, "thumbs")
+    variants = os.path.join(out_dir, image_store.DB_IMG_FOLDER, image_store.VARIANT_DIR)
+    encode = lambda: [thumbnails.thumbnail_data_uri(p) for p in paths]
+    results["image_to_base64.cold"] = measure(encode, lambda: _reset_thumbs(thumbs, variants), repeat=max(repeat // 2, 1), items=len(paths))
+    thumbnails._mem.clear()
+    results["image_to_base64.disk"] = measure(encode, thumbnails._mem.clear, repeat, items=len(paths))
+    results["image_to_base64.warm"] = measure(encode, repeat=repeat, items=len(paths))
+
+    results["price_catalog"] = measure(lambda: price_catalog(df, skus, 5.35, channel_names("air")[0]), repeat=repeat, items=len(skus))
+    os.chdir(ROOT)
+    return results
+
+def bench_scalar(repeat):
+    # 与商品库大小无关, 只跑一次
+    rng = random.Random(0)
+    chans = channel_names()
+    args = [(rng.uniform(0.1, 15), rng.choice(chans), rng.choice([0.0, 6000.0, 36000.0])) for _ in range(N_SCALAR)]
+    air = channel_names("air")[0]
+    return {
+        "get_ship_cost_cny": measure(lambda: [get_ship_cost_cny(w, c, v) for w, c, v in args], repeat=repeat, items=N_SCALAR),
+        "calculate_sku_variant": measure(lambda: [calculate_sku_variant(30.0, 0.0, w, 2, 0.3, 0.05, 5.35, air, unit_volume=v)
+                                                  for w, _, v in args], repeat=repeat, items=N_SCALAR),
+    }
+
+# === 2. 基线比较 ===
+def compare(results, baseline, time_tol=TIME_TOLERANCE, mem_tol=MEM_TOLERANCE):
+    failures = []
+    for key, cur in results.items():
+        base = baseline.get(key)
+        if base is None: continue
+        if cur["seconds"] > base["seconds"] * (1 + time_tol) and cur["seconds"] - base["seconds"] > TIME_FLOOR:
+            failures.append(f"{key}: 耗时 {base['seconds'] * 1000:.1f}ms → {cur['seconds'] * 1000:.1f}ms")
+        if cur["peak_mb"] > base["peak_mb"] * (1 + mem_tol) + MEM_FLOOR_MB:
+            failures.append(f"{key}: 峰值内存 {base['peak_mb']:.1f}MB → {cur['peak_mb']:.1f}MB")
+    return failures
+
+def report(results, baseline):
+    print(f"{'场景':<34}{'耗时(ms)':>11}{'吞吐(/s)':>13}{'峰值(MB)':>11}{'基线(ms)':>11}")
+    for key, r in results.items():
+        base = baseline.get(key)
+        print(f"{key:<36}{r['seconds'] * 1000:>11.2f}{r['per_sec']:>13.0f}{r['peak_mb']:>11.2f}"
+              + (f"{base['seconds'] * 1000:>11.2f}" if base else f"{'-':>11}"))
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="商品库性能基准")
+    parser.add_argument("--sizes", default="1000,10000", help="商品数量, 逗号分隔")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--baseline", default=BASELINE_FILE)
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--time-tolerance", type=float, default=TIME_TOLERANCE)
+    parser.add_argument("--mem-tolerance", type=float, default=MEM_TOLERANCE)
+    parser.add_argument("--out", default=None, help="结果另存为 JSON")
+    args = parser.parse_args(argv)
+
+    results = {f"scalar/{k}": v for k, v in bench_scalar(args.repeat).items()}
+    for n in (int(s) for s in args.sizes.split(",") if s.strip()):
+        results.update({f"{n}/{k}": v for k, v in bench_size(n, args.repeat).items()})
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline, encoding="utf-8") as f: baseline = json.load(f).get("results", {})
+    report(results, baseline)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f: json.dump({"results": results}, f, ensure_ascii=False, indent=1)
+    if args.save_baseline:
+        doc = {"python": platform.python_version(), "machine": platform.machine(), "results": {**baseline, **results}}
+        with open(args.baseline, "w", encoding="utf-8") as f: json.dump(doc, f, ensure_ascii=False, indent=1)
+        print(f"基线已写入 {args.baseline}", file=sys.stderr)
+        return 0
+    failures = compare(results, baseline, args.time_tolerance, args.mem_tolerance)
+    for msg in failures: print("❌ 退化: " + msg, file=sys.stderr)
+    return 1 if failures else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
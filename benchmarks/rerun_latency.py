@@ -0,0 +1,138 @@
+import os
+import sys
+import json
+import time
+import argparse
+import statistics
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(ROOT))
+sys.path.insert(0, ROOT)
+import synth_catalog
+from streamlit import logger as st_logger
+from streamlit.testing.v1 import AppTest
+from streamlit.runtime.forward_msg_queue import ForwardMsgQueue
+from streamlit.runtime.memory_media_file_storage import MemoryMediaFileStorage
+
+# === 端到端重跑延迟: 无浏览器驱动 start.py / app.py 的常见交互 ===
+# 例: python benchmarks/rerun_latency.py --sizes 1000,10000 --repeat 10 --images 500
+# 每个交互统计脚本运行耗时 p50 / p95, 以及发往前端的消息字节数与媒体文件字节数
+APP_DIR = os.path.dirname(ROOT)
+DATA_DIR = os.path.join(APP_DIR, ".cache", "bench")
+TIMEOUT = 300
+
+# === 1. 发送字节计数 (包装 ForwardMsgQueue / 媒体文件存储) ===
+_sent = {"msg_bytes": 0, "media_bytes": 0}
+_enqueue = ForwardMsgQueue.enqueue
+_load_media = MemoryMediaFileStorage.load_and_get_id
+
+def _counting_enqueue(self, msg):
+    _sent["msg_bytes"] += msg.ByteSize()
+    return _enqueue(self, msg)
+
+def _counting_media(self, path_or_data, *args, **kwargs):
+    _sent["media_bytes"] += os.path.getsize(path_or_data) if isinstance(path_or_data, str) else len(path_or_data)
+    return _load_media(self, path_or_data, *args, **kwargs)
+
+ForwardMsgQueue.enqueue = _counting_enqueue
+MemoryMediaFileStorage.load_and_get_id = _counting_media
+
+class Recorder:
+    def __init__(self): self.samples = {}
+
+    def run(self, name, action):
+        # action() 触发一次脚本运行并返回 AppTest; 出错时记录异常, 不中断其余交互
+        _sent.update(msg_bytes=0, media_bytes=0)
+        t = time.perf_counter()
+        at = action()
+        sec = time.perf_counter() - t
+        errors = [e.value for e in at.exception]
+        self.samples.setdefault(name, []).append({"seconds": sec, **_sent, "errors": errors})
+        return at
+
+    def summary(self):
+        out = {}
+        for name, rows in self.samples.items():
+            secs = sorted(r["seconds"] for r in rows)
+            out[name] = {
+                "runs": len(rows),
+                "p50_ms": round(statistics.median(secs) * 1000, 1),
+                "p95_ms": round(secs[min(len(secs) - 1, int(round(0.95 * (len(secs) - 1))))] * 1000, 1),
+                "msg_kb": round(statistics.mean(r["msg_bytes"] for r in rows) / 1024, 1),
+                "media_kb": round(statistics.mean(r["media_bytes"] for r in rows) / 1024, 1),
+                "errors": sorted({e for r in rows for e in r["errors"]}),
+            }
+        return out
+
+def _app(script, **state):
+    at = AppTest.from_file(os.path.join(APP_DIR, script), default_timeout=TIMEOUT)
+    for k, v in state.items(): at.session_state[k] = v
+    return at
+
+def _by_label(widgets, label):
+    return next(w for w in widgets if w.label == label)
+
+# === 2. 交互场景 ===
+def drive_start(rec, repeat, product_id):
+    for _ in range(repeat):
+        rec.run("start: 打开首页", lambda: _app("start.py").run())
+    for _ in range(repeat):
+        # 表格行点击 = 写入 editing_index 后重跑进入详情页
+        at = rec.run("start: 点击表格行 → 详情", lambda: _app("start.py", current_view="detail", editing_index=product_id).run())
+    for i in range(repeat):
+        rec.run("start: 修改 SKU 利润%", lambda: at.number_input(key=f"sp_{product_id}_0").set_value(20.0 + i).run())
+
+def drive_app(rec, repeat, queries):
+    for _ in range(repeat):
+        at = rec.run("app: 打开详情页", lambda: _app("app.py").run())
+    at = rec.run("app: 切换到画廊", lambda: at.radio[0].set_value("🏠 商品画廊 (主页)").run())
+    for _ in range(repeat):
+        for q in queries:
+            # 逐字输入, 每个按键一次重跑
+            for n in range(1, len(q) + 1):
+                at = rec.run("app: 画廊搜索 (每次按键)", lambda: _by_label(at.text_input, "🔍 搜索...").set_value(q[:n]).run())
+        at = rec.run("app: 画廊搜索 (每次按键)", lambda: _by_label(at.text_input, "🔍 搜索...").set_value("").run())
+    for i in range(repeat):
+        at = rec.run("app: 画廊翻页", lambda: _by_label(at.number_input, "页码").set_value(2 + i % 3).run())
+
+def run_size(n, repeat, n_images, queries):
+    out_dir = os.path.join(DATA_DIR, f"app_{n}")
+    synth_catalog.build(out_dir, n, n_images=n_images)
+    cwd = os.getcwd()
+    os.chdir(out_dir)   # 两个应用都按相对路径读写商品库 / 图片
+    try:
+        import catalog_store
+        product_id = int(catalog_store.load_catalog().index[0])
+        rec = Recorder()
+        drive_start(rec, repeat, product_id)
+        drive_app(rec, repeat, queries)
+    finally: os.chdir(cwd)
+    return rec.summary()
+
+def report(n, summary):
+    print(f"\n== {n} 个商品 ==")
+    print(f"{'交互':<28}{'次数':>6}{'p50(ms)':>10}{'p95(ms)':>10}{'消息(KB)':>11}{'媒体(KB)':>11}")
+    for name, s in summary.items():
+        print(f"{name:<30}{s['runs']:>6}{s['p50_ms']:>10.1f}{s['p95_ms']:>10.1f}{s['msg_kb']:>11.1f}{s['media_kb']:>11.1f}"
+              + (f"  ⚠️ {s['errors'][0][:60]}" if s["errors"] else ""))
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Streamlit 重跑延迟测试")
+    parser.add_argument("--sizes", default="1000", help="商品数量, 逗号分隔")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--images", type=int, default=200, help="合成图片数量 (商品循环引用)")
+    parser.add_argument("--query", action="append", default=None, help="画廊搜索词, 可多次指定")
+    parser.add_argument("--out", default=None, help="结果另存为 JSON")
+    args = parser.parse_args(argv)
+
+    st_logger.set_log_level("error")   # 无界面运行时的 ScriptRunContext 警告
+    results = {}
+    for n in (int(s) for s in args.sizes.split(",") if s.strip()):
+        results[n] = run_size(n, args.repeat, args.images, args.query or ["猫咪摇篮", "zdwsq"])
+        report(n, results[n])
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f: json.dump(results, f, ensure_ascii=False, indent=1)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
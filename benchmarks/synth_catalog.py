@@ -0,0 +1,79 @@
+import os
+import sys
+import json
+import random
+import argparse
+import numpy as np
+import pandas as pd
+from PIL import Image
+
+# === 合成商品库: 列与 product_database_master.csv 一致, 图片与 db_images/ 相同结构 ===
+# 例: python benchmarks/synth_catalog.py .cache/bench/10000 --products 10000 --images 500
+CSV_COLUMNS = ["图片路径", "商品", "重量", "数量", "包装尺寸(cm)", "进货价", "目标利润率", "广告占比", "空运售价(SGD)", "真实售价",
+               "硬成本(RMB)", "竞品价(SGD)", "文案", "备注", "采购链接", "Shopee竞品链接", "SKU配置", "时间", "空运利润(RMB)",
+               "海运售价(SGD)", "海运利润(RMB)", "链接", "暴利模式净赚(RMB)", "链接/来源"]
+ADJ = ["加厚", "防水", "静音", "耐咬", "可拆洗", "透气", "保暖", "网红", "大号", "迷你", "四季通用", "自动", "升级款", "实木", "宠物专用"]
+PET = ["猫咪", "狗狗", "小型犬", "布偶猫", "柯基", "仓鼠", "兔子", "泰迪"]
+ITEM = ["双层摇篮床", "猫抓板", "饮水机", "自动喂食器", "牵引绳", "逗猫棒", "猫砂盆", "航空箱", "保暖窝", "磨牙玩具", "梳毛刷", "冻干零食"]
+TAIL = ["", "-tmall.com天猫", "-淘宝网", "包邮", "2025新款", "工厂直销"]
+COPY = ("Premium pet essential designed for everyday comfort.\n\nOverview\n- Durable materials\n- Easy to clean\n"
+        "- Suitable for cats and small dogs\n\nSpecifications\nSize: {dims} cm\nWeight: {w} kg\n")
+
+def title(rng, i):
+    return f"{i % 1000:03d}{rng.choice(PET)}{rng.choice(ADJ)}{rng.choice(ITEM)}{rng.choice(TAIL)}"
+
+def make_images(folder, n, size=(800, 800), seed=0):
+    # 带噪点的色块图, 体积与商品主图接近 (PNG 无法高比例压缩)
+    os.makedirs(folder, exist_ok=True)
+    rng = np.random.default_rng(seed)
+    paths = []
+    for i in range(n):
+        path = os.path.join(folder, f"synthetic_{i:05d}.png")
+        if not os.path.exists(path):
+            base = rng.integers(0, 256, 3, dtype=np.uint8)
+            img = np.clip(base + rng.integers(-24, 24, (size[1] // 4, size[0] // 4, 3)), 0, 255).astype(np.uint8)
+            Image.fromarray(img).resize(size, Image.NEAREST).save(path)
+        paths.append(path)
+    return paths
+
+def make_catalog(n, image_paths=(), seed=0):
+    rng = random.Random(seed)
+    rows = []
+    for i in range(n):
+        w = round(rng.uniform(0.1, 12.0), 2)
+        dims = "x".join(f"{rng.choice([0, 10, 20, 30, 40, 60]):.1f}" for _ in range(3))
+        cost = round(rng.uniform(5, 300), 1)
+        profit = rng.choice([15, 20, 25, 30, 40])
+        skus = [{"name": f"{q}件装", "qty": q, "cost": round(cost * q, 2), "profit": profit / 100,
+                 "fixed_price": rng.choice([0.0, 0.0, round(rng.uniform(10, 90), 1)]), "comp_price": rng.choice([0.0, round(rng.uniform(10, 90), 1)])}
+                for q in rng.sample([1, 2, 3, 5], rng.randint(1, 3))]
+        rows.append({
+            "图片路径": image_paths[i % len(image_paths)] if image_paths else "",
+            "商品": title(rng, i), "重量": w, "数量": 1, "包装尺寸(cm)": dims, "进货价": cost,
+            "目标利润率": f"{profit:.1f}%", "广告占比": f"{rng.choice([0, 5, 10]):.1f}%",
+            "空运售价(SGD)": 0.0, "真实售价": 0.0, "硬成本(RMB)": 0.0, "竞品价(SGD)": 0.0,
+            "文案": COPY.format(dims=dims, w=w), "备注": "", "采购链接": f"https://item.taobao.com/item.htm?id={10**11 + i}",
+            "Shopee竞品链接": "", "SKU配置": json.dumps(skus, ensure_ascii=False), "时间": "2025-11-24 10:00",
+            "空运利润(RMB)": 0.0, "海运售价(SGD)": 0.0, "海运利润(RMB)": 0.0, "链接": "", "暴利模式净赚(RMB)": 0.0, "链接/来源": "",
+        })
+    return pd.DataFrame(rows, columns=CSV_COLUMNS)
+
+def build(out_dir, n_products, n_images=200, seed=0):
+    # 已生成过则直接复用; 返回 CSV 路径 (图片路径相对 out_dir)
+    csv_path = os.path.join(out_dir, "product_database_master.csv")
+    if os.path.exists(csv_path): return csv_path
+    os.makedirs(out_dir, exist_ok=True)
+    paths = make_images(os.path.join(out_dir, "db_images"), n_images, seed=seed)
+    df = make_catalog(n_products, [os.path.relpath(p, out_dir) for p in paths], seed=seed)
+    df.to_csv(csv_path + ".tmp", index=False, encoding="utf-8-sig")
+    os.replace(csv_path + ".tmp", csv_path)
+    return csv_path
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="生成合成商品库")
+    parser.add_argument("out_dir")
+    parser.add_argument("--products", type=int, default=1000)
+    parser.add_argument("--images", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    print(build(args.out_dir, args.products, args.images, args.seed), file=sys.stderr)
@@ -0,0 +1,244 @@
+import os
+import re
+import sys
+import json
+import time
+import hashlib
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+import pandas as pd
+import catalog_store
+import image_store
+import rates
+from pricing import channel_names, price_catalog, parse_pct_column
+
+# === 批量导入: 供应商表格 + 图片文件夹 → 一次定价, 一个事务写入 ===
+# 例: python bulk_import.py supplier.xlsx --images ./photos            (预检, 不写入)
+#     python bulk_import.py supplier.xlsx --images ./photos --apply    (导入)
+# 表头按别名识别; 图片列可写文件名, 没有图片列时按 商品名 / 开头编号 (如 025) 匹配文件名
+COLUMN_ALIASES = {
+    "商品": ["商品", "商品名称", "名称", "标题", "品名", "title", "name"],
+    "进货价": ["进货价", "单价", "成本", "采购价", "价格", "cost", "price"],
+    "重量": ["重量", "重量(kg)", "单件实重", "毛重", "weight"],
+    "数量": ["数量", "起订量", "qty"],
+    "包装尺寸(cm)": ["包装尺寸(cm)", "包装尺寸", "尺寸", "dims"],
+    "目标利润率": ["目标利润率", "利润率", "profit"],
+    "广告占比": ["广告占比", "广告", "ad"],
+    "竞品价(SGD)": ["竞品价(SGD)", "竞品价", "comp_price"],
+    "真实售价": ["真实售价", "手动定价", "售价", "fixed_price"],
+    "采购链接": ["采购链接", "链接", "供应商链接", "url", "link"],
+    "Shopee竞品链接": ["Shopee竞品链接", "shopee"],
+    "文案": ["文案", "描述", "description"],
+    "备注": ["备注", "note"],
+    "图片": ["图片", "图片文件", "主图", "图片路径", "image"],
+    "SKU配置": ["SKU配置", "sku"],
+}
+IMAGE_EXTS = {".jpg", ".jpeg", ".png", ".webp", ".bmp", ".gif"}
+CODE_RE = re.compile(r'^\s*(\d+(?:\.\d+)?)')
+RATE_WAIT = 10   # --rate auto 时最多等待实时汇率的秒数
+
+# === 1. 读取表格 ===
+def read_sheet(src):
+    # src: 路径或带 name 属性的文件对象 (st.file_uploader); xlsx 需要 openpyxl
+    name = str(getattr(src, "name", src)).lower()
+    if name.endswith((".xlsx", ".xls")): raw = pd.read_excel(src, dtype=str)
+    else: raw = pd.read_csv(src, dtype=str, encoding="utf-8-sig")
+    lookup = {str(c).strip().lower(): c for c in raw.columns}
+    mapping = {}
+    for canon, aliases in COLUMN_ALIASES.items():
+        for a in aliases:
+            if a.lower() in lookup and lookup[a.lower()] not in mapping:
+                mapping[lookup[a.lower()]] = canon
+                break
+    df = raw[list(mapping)].rename(columns=mapping)
+    df.index = pd.RangeIndex(2, len(df) + 2)   # 表格行号 (第 1 行为表头)
+    return df.fillna("").apply(lambda s: s.str.strip())
+
+# === 2. 校验 (整列向量化) ===
+def validate(df, existing_names=()):
+    num = lambda c: pd.to_numeric(df[c], errors="coerce") if c in df.columns else pd.Series(float("nan"), index=df.index)
+    checks = [
+        (df["商品"].eq("") if "商品" in df.columns else pd.Series(True, index=df.index), "缺少商品名称"),
+        (~(num("进货价") > 0), "进货价无效"),
+        (~(num("重量") > 0), "重量无效"),
+    ]
+    if "商品" in df.columns:
+        checks.append((df["商品"].isin(set(existing_names)) & df["商品"].ne(""), "商品已在库中"))
+    errors = {}
+    for mask, msg in checks:
+        for row in df.index[mask]: errors.setdefault(row, []).append(msg)
+    warnings = {}
+    if "商品" in df.columns:
+        for row in df.index[df["商品"].duplicated(keep="first") & df["商品"].ne("")]:
+            warnings.setdefault(row, []).append("表格内商品名重复")
+    return errors, warnings
+
+# === 3. 图片: 匹配文件, 并行规范化 (image_store.prepare) 后按内容去重写入 ===
+def _index_folder(folder):
+    by_stem, by_code = {}, {}
+    if not folder or not os.path.isdir(folder): return by_stem, by_code
+    for e in sorted(os.scandir(folder), key=lambda e: e.name):
+        stem, ext = os.path.splitext(e.name)
+        if not e.is_file() or ext.lower() not in IMAGE_EXTS: continue
+        by_stem.setdefault(stem.strip().lower(), e.path)
+        m = CODE_RE.match(stem)
+        if m: by_code.setdefault(m.group(1), e.path)
+    return by_stem, by_code
+
+def match_images(df, folder):
+    by_stem, by_code = _index_folder(folder)
+    out = {}
+    for row in df.index:
+        ref = df.at[row, "图片"] if "图片" in df.columns else ""
+        if ref:
+            cand = os.path.join(folder, ref) if folder else ref
+            out[row] = cand if os.path.exists(cand) else ref if os.path.exists(ref) else None
+            continue
+        title = df.at[row, "商品"] if "商品" in df.columns else ""
+        m = CODE_RE.match(title)
+        out[row] = by_stem.get(title.lower()) or (by_code.get(m.group(1)) if m else None)
+    return out
+
+def process_images(paths, dry_run=True, folder=image_store.DB_IMG_FOLDER, workers=image_store.IO_WORKERS):
+    # paths: {行号: 源文件}; 返回 {行号: (入库路径, 错误, 是否新图)}, 预检时只算出目标路径不落盘
+    def work(item):
+        row, src = item
+        try: img, data, ext = image_store.prepare(src)
+        except Exception as e: return row, (None, f"图片无法读取: {os.path.basename(src)} ({e})", False)
+        path = f"{folder}/{hashlib.sha256(data).hexdigest()}{ext}"
+        is_new = not os.path.exists(path)
+        if not dry_run:
+            path = image_store.save_bytes(data, ext, folder)
+            image_store.write_variants(path, img)
+        return row, (path, None, is_new)
+    # 先按原文件内容哈希分组 (很快), 相同字节的图片只解码 / 编码一次
+    paths = {row: src for row, src in paths.items() if src}
+    with ThreadPoolExecutor(workers) as ex:
+        digests = dict(zip(paths, ex.map(image_store.file_digest, paths.values())))
+        unique = {}
+        for row, d in digests.items(): unique.setdefault(d, row)
+        done = dict(ex.map(work, ((row, paths[row]) for row in unique.values())))
+    return {row: done[unique[d]] for row, d in digests.items()}
+
+# === 4. SKU + 一次性向量化定价 ===
+def _sku_lists(df):
+    num = lambda c, d: pd.to_numeric(df[c], errors="coerce").fillna(d) if c in df.columns else pd.Series(d, index=df.index)
+    qty, cost = num("数量", 1).clip(lower=1).astype(int), num("进货价", 0.0)
+    profit = parse_pct_column(df["目标利润率"] if "目标利润率" in df.columns else pd.Series("", index=df.index), 30.0) / 100
+    fixed, comp = num("真实售价", 0.0), num("竞品价(SGD)", 0.0)
+    out = {}
+    for row in df.index:
+        raw = df.at[row, "SKU配置"] if "SKU配置" in df.columns else ""
+        try: parsed = json.loads(raw) if raw else None
+        except ValueError: parsed = None
+        if isinstance(parsed, list) and parsed: out[row] = [s for s in parsed if isinstance(s, dict)]
+        else:
+            q = int(qty[row])
+            out[row] = [{"name": f"{q}件装", "qty": q, "cost": float(cost[row]) * q, "profit": float(profit[row]),
+                         "fixed_price": float(fixed[row]), "comp_price": float(comp[row])}]
+    return out
+
+def price_rows(df, sku_lists, rate, channel, domestic=0.0):
+    frame = pd.DataFrame([{"product_id": row, "pos": pos, **{c: s.get(c) for c in catalog_store.SKU_COLUMNS}}
+                          for row, lst in sku_lists.items() for pos, s in enumerate(lst)],
+                         columns=["product_id", "pos"] + catalog_store.SKU_COLUMNS)
+    for c in ["qty", "cost", "profit", "fixed_price", "comp_price"]:
+        frame[c] = pd.to_numeric(frame[c], errors="coerce").fillna(1 if c == "qty" else 0.0)
+    priced = price_catalog(df, frame, rate, channel, domestic)
+    return priced[priced["sku_idx"] == 0].set_index("product")
+
+# === 5. 主流程 ===
+def run_import(src, image_folder=None, rate=None, channel=None, domestic=0.0, dry_run=True,
+               db_path=catalog_store.CATALOG_DB_FILE, allow_duplicates=False):
+    t0 = time.perf_counter()
+    if rate is None:
+        rates.refresh(wait=RATE_WAIT)
+        # 写库时不接受默认值 / 过期缓存
+        if not dry_run and not rates.is_fresh(): raise ValueError("实时汇率不可用, 请指定汇率后再导入")
+        rate = rates.get_rate()
+    channel = channel or channel_names("air")[0]
+    df = read_sheet(src)
+    existing = [] if allow_duplicates else catalog_store.load_catalog(db_path, columns=["商品"]).get("商品", [])
+    errors, warnings = validate(df, existing)
+
+    found = match_images(df, image_folder)
+    images = process_images({r: p for r, p in found.items() if r not in errors}, dry_run=dry_run)
+    for row, (_, err, _) in images.items():
+        if err: warnings.setdefault(row, []).append(err)
+    for row in df.index:
+        if row not in errors and "图片" in df.columns and df.at[row, "图片"] and not found.get(row):
+            warnings.setdefault(row, []).append(f"找不到图片: {df.at[row, '图片']}")
+
+    ok = df.drop(index=list(errors))
+    sku_lists = _sku_lists(ok)
+    priced = price_rows(ok, sku_lists, rate, channel, domestic) if len(ok) else pd.DataFrame()
+    stamp = time.strftime("%m-%d %H:%M")
+    rows = []
+    for row in ok.index:
+        p, first = priced.loc[row], sku_lists[row][0]
+        rows.append({
+            "图片路径": (images.get(row) or (None,))[0] or "", "商品": ok.at[row, "商品"],
+            "重量": float(ok.at[row, "重量"]), "数量": int(first.get("qty", 1)), "包装尺寸(cm)": ok.get("包装尺寸(cm)", {}).get(row, ""),
+            "进货价": float(ok.at[row, "进货价"]),
+            "目标利润率": f"{float(first.get('profit', 0.3)) * 100}%", "广告占比": f"{float(p['ad']) * 100}%",
+            "空运售价(SGD)": round(float(p["suggested_price"]), 2), "真实售价": round(float(p["final_price"]), 2),
+            "硬成本(RMB)": round(float(p["air_hard_cny"]), 2), "竞品价(SGD)": float(first.get("comp_price", 0.0) or 0.0),
+            **{c: ok.at[row, c] if c in ok.columns else "" for c in ["文案", "备注", "采购链接", "Shopee竞品链接"]},
+            "时间": stamp,
+        })
+
+    inserted = []
+    if not dry_run and rows:
+        # 表格首行为最新商品, 与 CSV 迁移一致: 倒序插入
+        inserted = catalog_store.insert_many(rows[::-1], [sku_lists[r] for r in ok.index[::-1]], db_path)[::-1]
+
+    targets = {p: new for p, _, new in images.values() if p}
+    preview = pd.DataFrame(rows, index=ok.index)
+    if len(preview):
+        preview["实时净赚(¥)"] = priced["air_profit_cny"].round(1)
+        preview["实时利润率"] = (priced["air_margin"] * 100).round(1)
+    return {
+        "rows": len(df), "valid": len(ok), "inserted": len(inserted), "dry_run": dry_run, "rate": rate, "channel": channel,
+        "errors": [{"行": r, "商品": df.at[r, "商品"] if "商品" in df.columns else "", "错误": "; ".join(m)} for r, m in sorted(errors.items())],
+        "warnings": [{"行": r, "商品": df.at[r, "商品"] if "商品" in df.columns else "", "提示": "; ".join(m)} for r, m in sorted(warnings.items())],
+        "images": {"matched": sum(1 for p in found.values() if p), "unique": len(set(targets)),
+                   "new": sum(targets.values())},
+        "preview": preview, "ids": inserted, "seconds": round(time.perf_counter() - t0, 2),
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="批量导入商品 (表格 + 图片文件夹)")
+    parser.add_argument("sheet", help=".csv / .xlsx")
+    parser.add_argument("--images", default=None, help="图片文件夹")
+    parser.add_argument("--rate", default="auto", help="SGD→CNY 汇率; auto 为实时汇率 (获取失败时拒绝 --apply)")
+    parser.add_argument("--channel", default=None, choices=channel_names("air"))
+    parser.add_argument("--domestic", type=float, default=0.0)
+    parser.add_argument("--allow-duplicates", action="store_true", help="允许导入库中已有的商品名")
+    parser.add_argument("--report", default=None, help="错误 / 提示写出为 CSV")
+    parser.add_argument("--apply", action="store_true", help="实际写入 (默认仅预检)")
+    parser.add_argument("--db", default=catalog_store.CATALOG_DB_FILE)
+    args = parser.parse_args(argv)
+    if args.rate == "auto":
+        rates.refresh(wait=RATE_WAIT)
+        if not rates.is_fresh():
+            info = rates.status()
+            msg = f"实时汇率不可用 ({info['error'] or '刷新超时'}), 当前 {rates.get_rate():.4f} 来自{'默认值' if info['rate'] is None else '过期缓存'}"
+            if args.apply: parser.error(msg + "; --apply 需用 --rate 指定数值")
+            print("⚠️ " + msg, file=sys.stderr)
+        rate = rates.get_rate()
+    else:
+        try: rate = float(args.rate)
+        except ValueError: parser.error(f"--rate 应为数值或 auto: {args.rate}")
+    report = run_import(args.sheet, args.images, rate, args.channel, args.domestic, not args.apply, args.db, args.allow_duplicates)
+    for item in report["errors"]: print(f"❌ 第 {item['行']} 行 {item['商品']}: {item['错误']}", file=sys.stderr)
+    for item in report["warnings"]: print(f"⚠️ 第 {item['行']} 行 {item['商品']}: {item['提示']}", file=sys.stderr)
+    if args.report:
+        pd.DataFrame([{**e, "类型": "错误"} for e in report["errors"]] + [{**w, "类型": "提示"} for w in report["warnings"]]) \
+          .to_csv(args.report, index=False, encoding="utf-8-sig")
+    img = report["images"]
+    print(f"{'已导入' if args.apply else '预检'}: {report['valid']}/{report['rows']} 行有效, 写入 {report['inserted']} 个商品 · "
+          f"图片 {img['matched']} 张匹配 / {img['unique']} 张不重复 / {img['new']} 张新增 · {report['seconds']}s")
+    return 1 if report["errors"] and not args.apply else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,454 @@
+import os
+import glob
+import json
+import hashlib
+import sqlite3
+import threading
+import pandas as pd
+from pricing import DIM_COLUMNS, parse_dims, parse_pct_column
+
+# 可选: 安装 pyarrow 后, 商品表额外镜像为 Arrow 列式快照 (mmap 读取 + 按列投影)
+try:
+    import pyarrow as pa
+except ImportError:
+    pa = None
+
+# === 存储设置 ===
+MASTER_DB_FILE = "product_database_master.csv"
+CATALOG_DB_FILE = "product_database_master.db"
+SNAPSHOT_DIR = os.path.join(".cache", "catalog")
+
+# 已知列及其 SQLite 类型 (其它列在首次写入时自动追加为 TEXT)
+COLUMNS = {
+    "图片路径": "TEXT", "商品": "TEXT", "重量": "REAL", "数量": "INTEGER", "包装尺寸(cm)": "TEXT",
+    "进货价": "REAL", "目标利润率": "TEXT", "广告占比": "TEXT", "空运售价(SGD)": "REAL", "真实售价": "REAL",
+    "硬成本(RMB)": "REAL", "竞品价(SGD)": "REAL", "文案": "TEXT", "备注": "TEXT", "采购链接": "TEXT",
+    "Shopee竞品链接": "TEXT", "时间": "TEXT"
+}
+# SKU 独立成表 (product_id, pos) -> 变体; SKU配置 JSON 仅在 CSV 导入 / 导出时出现
+SKU_COLUMNS = ["name", "qty", "cost", "profit", "fixed_price", "comp_price"]
+SKU_JSON_COLUMN = "SKU配置"
+# 仅用于界面的临时列, 不落库
+TRANSIENT_COLUMNS = ["删除", "Delete", "选择", "图片预览"]
+
+# 旧版遗留列: 已无代码读写, 初始化时把非空值存入 legacy_archive 表后从 products 删除
+LEGACY_COLUMNS = ["链接", "链接/来源", "暴利模式净赚(RMB)", "海运利润(RMB)", "空运利润(RMB)", "海运售价(SGD)"]
+LEGACY_LINK_COLUMNS = ["链接", "链接/来源"]   # 采购链接 为空时先用它们补上
+
+# === 载入时的类型 (只解析一次, 界面 / 定价直接用数值) ===
+# 数值列: 缺失记为默认值, 不再被 fillna("") 变成 object 列
+NUMERIC_COLUMNS = {"重量": 0.0, "进货价": 0.0, "空运售价(SGD)": 0.0, "真实售价": 0.0, "硬成本(RMB)": 0.0, "竞品价(SGD)": 0.0}
+INT_COLUMNS = {"数量": 1}
+# 百分比列: 库里存 "15.0%", 载入为 15.0
+PCT_COLUMNS = {"目标利润率": 30.0, "广告占比": 0.0}
+# 尺寸列: 库里存 "长x宽x高", 载入为 长(cm) / 宽(cm) / 高(cm) 三列 float
+DIM_COLUMN = "包装尺寸(cm)"
+# 文本列: 缺失记为 ""
+DEFAULTS = {"文案": "", "图片路径": "", "采购链接": "", "Shopee竞品链接": "", "备注": ""}
+DROP_ON_LOAD = TRANSIENT_COLUMNS + LEGACY_COLUMNS + ["利润率"]
+
+# 缓存返回浅拷贝, 靠 pandas>=3 的写时复制保证调用方的修改不会污染缓存; 更旧的 pandas 返回深拷贝 (不改全局选项)
+_COPY_ON_WRITE = int(pd.__version__.split(".")[0]) >= 3
+
+_init_lock = threading.Lock()
+_initialized = set()              # 以下各表都按绝对路径记: 切换工作目录后同名相对路径是另一个库
+_cache_lock = threading.Lock()    # 只保护 _cache / _versions 字典本身, 持有期间不读盘、不构建
+_cache = {}
+_build_locks = {}                 # (库绝对路径, kind) -> Lock: 同一项只由一个会话构建, 其它项 / 其它会话不受阻塞
+_versions = {}                    # 库绝对路径 -> [版本号, 对应的 data_signature]
+
+def _q(name): return '"' + str(name).replace('"', '""') + '"'
+
+def _py(v):
+    # numpy 标量 / NaN 转为 sqlite 可绑定的 Python 值
+    if hasattr(v, 'item'): v = v.item()
+    if isinstance(v, float) and v != v: return None
+    return v
+
+def _num(v, default):
+    try:
+        f = float(v)
+        return f if f == f else default
+    except (TypeError, ValueError): return default
+
+def _columns(conn):
+    return [r[1] for r in conn.execute("PRAGMA table_info(products)")]
+
+def _ensure_columns(conn, names):
+    existing = set(_columns(conn))
+    for c in names:
+        if c not in existing and c not in TRANSIENT_COLUMNS and c != "id":
+            conn.execute(f"ALTER TABLE products ADD COLUMN {_q(c)} {COLUMNS.get(c, 'TEXT')}")
+            existing.add(c)
+
+# === 1. 连接 / 初始化 ===
+def connect(db_path=CATALOG_DB_FILE, csv_path=MASTER_DB_FILE):
+    conn = sqlite3.connect(db_path, timeout=30)
+    key = os.path.abspath(db_path)
+    if key not in _initialized:
+        with _init_lock:
+            if key not in _initialized:
+                _init(conn, csv_path)
+                _initialized.add(key)
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("PRAGMA foreign_keys=ON")
+    return conn
+
+def _touch(conn):
+    # 写入计数 +1, 与数据改动同一事务提交; 缓存 / 快照按它失效
+    conn.execute("INSERT INTO meta (key, value) VALUES ('data_version', 1) "
+                 "ON CONFLICT(key) DO UPDATE SET value = CAST(value AS INTEGER) + 1")
+
+def _init(conn, csv_path):
+    conn.execute("PRAGMA journal_mode=WAL")
+    cols = ", ".join(f"{_q(c)} {t}" for c, t in COLUMNS.items())
+    with conn:
+        conn.execute(f"CREATE TABLE IF NOT EXISTS products (id INTEGER PRIMARY KEY AUTOINCREMENT, {cols})")
+        conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+        # 库实例 id: 删库重建后计数从头开始, 靠它区分新旧快照
+        conn.execute("INSERT OR IGNORE INTO meta (key, value) VALUES ('db_uid', lower(hex(randomblob(8))))")
+        conn.execute("""CREATE TABLE IF NOT EXISTS skus (
+            product_id INTEGER NOT NULL REFERENCES products(id) ON DELETE CASCADE,
+            pos INTEGER NOT NULL, name TEXT, qty INTEGER NOT NULL DEFAULT 1,
+            cost REAL NOT NULL DEFAULT 0, profit REAL NOT NULL DEFAULT 0,
+            fixed_price REAL NOT NULL DEFAULT 0, comp_price REAL NOT NULL DEFAULT 0,
+            PRIMARY KEY (product_id, pos))""")
+    migrated = conn.execute("SELECT value FROM meta WHERE key='csv_migrated'").fetchone()
+    if not migrated and csv_path and os.path.exists(csv_path):
+        migrate_from_csv(conn, csv_path)
+    if not conn.execute("SELECT value FROM meta WHERE key='skus_migrated'").fetchone():
+        migrate_sku_json(conn)
+    if set(LEGACY_COLUMNS) & set(_columns(conn)):
+        archive_legacy_columns(conn)
+
+def migrate_from_csv(conn, csv_path):
+    # 一次性迁移: CSV 首行为最新商品, 故倒序插入使其获得最大 id
+    df = pd.read_csv(csv_path)
+    df = df.drop(columns=[c for c in TRANSIENT_COLUMNS if c in df.columns])
+    with conn:
+        _ensure_columns(conn, df.columns)
+        col_sql = ", ".join(_q(c) for c in df.columns)
+        marks = ", ".join("?" for _ in df.columns)
+        conn.executemany(f"INSERT INTO products ({col_sql}) VALUES ({marks})",
+                         ([_py(v) for v in row] for row in df.iloc[::-1].itertuples(index=False)))
+        conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('csv_migrated', ?)", (os.path.abspath(csv_path),))
+        _touch(conn)
+    return len(df)
+
+def _sku_rows(pid, sku_list, base_cost=0.0, base_profit=0.30):
+    # 补齐缺省值, 与旧版 JSON 解析时的默认逻辑一致
+    for pos, sku in enumerate(sku_list):
+        qty = max(int(_num(sku.get("qty"), 1)), 1)
+        yield (int(pid), pos, str(sku.get("name", f"{qty}件装")), qty,
+               _num(sku.get("cost"), base_cost * qty), _num(sku.get("profit"), base_profit),
+               _num(sku.get("fixed_price"), 0.0), _num(sku.get("comp_price"), 0.0))
+
+def migrate_sku_json(conn):
+    # 一次性迁移: products.SKU配置 (JSON 字符串) -> skus 表, 迁移后清空旧列
+    has_json = SKU_JSON_COLUMN in _columns(conn)
+    with conn:
+        if has_json:
+            rows = conn.execute(f"SELECT id, {_q(SKU_JSON_COLUMN)}, \"进货价\", \"目标利润率\" FROM products").fetchall()
+            for pid, raw, cost, profit in rows:
+                try: sku_list = json.loads(raw) if raw else []
+                except (TypeError, ValueError): sku_list = []
+                if not isinstance(sku_list, list): sku_list = []
+                base_profit = _num(str(profit).replace('%', ''), 30.0) / 100
+                conn.execute("DELETE FROM skus WHERE product_id=?", (pid,))
+                conn.executemany("INSERT INTO skus VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                                 _sku_rows(pid, [s for s in sku_list if isinstance(s, dict)], _num(cost, 0.0), base_profit))
+            conn.execute(f"UPDATE products SET {_q(SKU_JSON_COLUMN)}=NULL")
+        conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('skus_migrated', '1')")
+        _touch(conn)
+
+def archive_legacy_columns(conn):
+    # 一次性: 遗留列的非空值 -> legacy_archive (product_id, col, value), 然后删列 (需 SQLite >= 3.35, 更旧的版本仅在载入时丢弃)
+    cols = [c for c in LEGACY_COLUMNS if c in _columns(conn)]
+    with conn:
+        conn.execute("""CREATE TABLE IF NOT EXISTS legacy_archive (
+            product_id INTEGER NOT NULL, col TEXT NOT NULL, value TEXT, PRIMARY KEY (product_id, col))""")
+        for c in cols:
+            conn.execute(f"INSERT OR REPLACE INTO legacy_archive SELECT id, ?, CAST({_q(c)} AS TEXT) FROM products "
+                         f"WHERE {_q(c)} IS NOT NULL AND CAST({_q(c)} AS TEXT) != ''", (c,))
+            if c in LEGACY_LINK_COLUMNS:
+                conn.execute(f"UPDATE products SET \"采购链接\"={_q(c)} "
+                             f"WHERE COALESCE(\"采购链接\", '') = '' AND {_q(c)} LIKE 'http%'")
+    for c in cols:
+        try:
+            with conn:
+                conn.execute(f"ALTER TABLE products DROP COLUMN {_q(c)}")
+                _touch(conn)
+        except sqlite3.OperationalError: pass
+
+# === 2. 读取 ===
+def load_frame(db_path=CATALOG_DB_FILE, columns=None):
+    # columns: 只读这些列 (不存在的列忽略)
+    conn = connect(db_path)
+    try:
+        existing = _columns(conn)
+        cols = "*" if columns is None else ", ".join(["id"] + [_q(c) for c in columns if c in existing])
+        df = pd.read_sql_query(f"SELECT {cols} FROM products ORDER BY id DESC", conn, index_col="id")
+    finally: conn.close()
+    df.index.name = None
+    return df.drop(columns=[SKU_JSON_COLUMN], errors="ignore")
+
+# === 2.1 列式快照: 每个库版本一个 Arrow IPC 文件 (不压缩, 可 mmap), 新版本写新文件, 不覆盖正在映射的旧文件 ===
+def _snapshot_path(db_path, sig):
+    return os.path.join(SNAPSHOT_DIR, f"{os.path.basename(db_path)}.{hashlib.sha1(repr(sig).encode()).hexdigest()[:16]}.arrow")
+
+def _arrow_column(series, sql_type):
+    if sql_type in ("REAL", "INTEGER"):
+        return pa.array(pd.to_numeric(series, errors="coerce"), type=pa.float64() if sql_type == "REAL" else pa.int64(), from_pandas=True)
+    return pa.array(series.where(series.isna(), series.astype(str)).astype(object), type=pa.string(), from_pandas=True)
+
+def write_snapshot(df, path):
+    names = ["id"] + [str(c) for c in df.columns]
+    arrays = [pa.array(df.index.to_numpy(), type=pa.int64())] + [_arrow_column(df[c], COLUMNS.get(c, "TEXT")) for c in df.columns]
+    table = pa.Table.from_arrays(arrays, names=names)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with pa.OSFile(tmp, "wb") as sink, pa.ipc.new_file(sink, table.schema) as writer: writer.write_table(table)
+    os.replace(tmp, path)
+    # 旧版本快照尽量清理 (Windows 上被其它进程映射时删不掉, 下次再试)
+    for old in glob.glob(glob.escape(path.rsplit(".", 2)[0]) + ".*.arrow"):
+        if old != path:
+            try: os.remove(old)
+            except OSError: pass
+
+def read_snapshot(path, columns=None):
+    table = pa.ipc.open_file(pa.memory_map(path, "r")).read_all()
+    if columns is not None: table = table.select(["id"] + [c for c in columns if c in table.column_names and c != "id"])
+    df = table.to_pandas().set_index("id")
+    df.index.name = None
+    return df
+
+def _load_products(db_path, columns=None):
+    # 有 pyarrow: 当前版本快照存在则 mmap 按列读取, 否则从 SQLite 读全表并写快照; 没有 pyarrow: SQL 按列读取
+    if pa is None: return load_frame(db_path, columns)
+    path = _snapshot_path(db_path, data_signature(db_path))
+    if os.path.exists(path):
+        try: return read_snapshot(path, columns)
+        except (OSError, pa.ArrowException): pass
+    df = load_frame(db_path)
+    try: write_snapshot(df, path)
+    except (OSError, pa.ArrowException): pass
+    return df if columns is None else df[[c for c in columns if c in df.columns]]
+
+def load_skus(pid, db_path=CATALOG_DB_FILE):
+    # 单个商品的 SKU 列表 (dict, 字段同旧版 SKU配置)
+    conn = connect(db_path)
+    try:
+        rows = conn.execute(f"SELECT {', '.join(SKU_COLUMNS)} FROM skus WHERE product_id=? ORDER BY pos", (int(pid),)).fetchall()
+    finally: conn.close()
+    return [dict(zip(SKU_COLUMNS, r)) for r in rows]
+
+def _load_sku_frame(db_path):
+    conn = connect(db_path)
+    try: df = pd.read_sql_query(f"SELECT product_id, pos, {', '.join(SKU_COLUMNS)} FROM skus ORDER BY product_id DESC, pos", conn)
+    finally: conn.close()
+    # SKU 名称高度重复 (1件装 / 2件装 ...), 用 category 存
+    df["name"] = df["name"].fillna("").astype("category")
+    return df
+
+def sku_query(where="1", params=(), db_path=CATALOG_DB_FILE):
+    # 全库 SKU 查询, 例: sku_query("s.name LIKE ?", ("%3件装%",)) / sku_query("s.comp_price > 0")
+    conn = connect(db_path)
+    try:
+        return pd.read_sql_query(f"SELECT s.*, p.\"商品\", p.\"重量\", p.\"广告占比\" FROM skus s JOIN products p ON p.id = s.product_id WHERE {where}",
+                                 conn, params=params)
+    finally: conn.close()
+
+def data_signature(db_path=CATALOG_DB_FILE):
+    # (库实例 id, 写入计数): 只随提交变化. 不看 -wal 文件: 其它会话 / 脚本开关连接就会建 / 删它, 只读也会改变文件签名
+    conn = connect(db_path)
+    try: rows = dict(conn.execute("SELECT key, value FROM meta WHERE key IN ('db_uid', 'data_version')").fetchall())
+    finally: conn.close()
+    return (rows.get("db_uid"), int(rows.get("data_version") or 0))
+
+def _prepare(df, columns=None):
+    # 按上面声明的类型解析; columns 不为空时只补齐其中的缺失列
+    if df.empty: return df
+    df = df.drop(columns=[c for c in DROP_ON_LOAD if c in df.columns])
+    wanted = lambda c: c not in df.columns and (columns is None or c in columns)
+    for col, default in {**NUMERIC_COLUMNS, **INT_COLUMNS}.items():
+        if col in df.columns: df[col] = pd.to_numeric(df[col], errors="coerce").fillna(default)
+        elif wanted(col): df[col] = default
+    for col, default in INT_COLUMNS.items():
+        if col in df.columns: df[col] = df[col].astype("int32")
+    for col, default in PCT_COLUMNS.items():
+        if col in df.columns: df[col] = parse_pct_column(df[col], default)
+        elif wanted(col): df[col] = default
+    if DIM_COLUMN in df.columns:
+        pos = df.columns.get_loc(DIM_COLUMN)
+        dims = parse_dims(df.pop(DIM_COLUMN))
+        for i, c in enumerate(DIM_COLUMNS): df.insert(pos + i, c, dims[c])
+    elif wanted(DIM_COLUMN):
+        for c in DIM_COLUMNS: df[c] = 0.0
+    typed = set(NUMERIC_COLUMNS) | set(INT_COLUMNS) | set(PCT_COLUMNS) | set(DIM_COLUMNS)
+    text = [c for c in df.columns if c not in typed]
+    df[text] = df[text].fillna("")
+    if "图片路径" in df.columns: df["图片路径"] = df["图片路径"].astype(str)
+    for col, default in DEFAULTS.items():
+        if wanted(col): df[col] = default
+    return df
+
+# === 2.2 进程内共享缓存: 所有会话共用一份数据, 按库版本失效 ===
+def _bump(key, sig):
+    # key 为库绝对路径, 调用方持有 _cache_lock; 旧版本的数据和派生结果立即释放, 不等下次读取
+    v = _versions.setdefault(key, [0, sig])
+    v[0], v[1] = v[0] + 1, sig
+    for k in [k for k in _cache if k[0] == key]: del _cache[k]
+
+def _changed(db_path):
+    # 本进程每次写入后调用; 读计数放在锁外
+    sig = data_signature(db_path)
+    key = os.path.abspath(db_path)
+    with _cache_lock:
+        if _versions.get(key, [0, None])[1] != sig: _bump(key, sig)
+
+def version(db_path=CATALOG_DB_FILE):
+    # 库版本号: 本进程写入, 或其它进程 (reprice / bulk_import 命令行等) 提交写入后递增
+    sig = data_signature(db_path)
+    key = os.path.abspath(db_path)
+    with _cache_lock:
+        v = _versions.setdefault(key, [0, sig])
+        if v[1] != sig: _bump(key, sig)
+        return v[0]
+
+def _cached(kind, loader, db_path):
+    # 库未写入则不读盘, 每个版本只解析一次; 返回拷贝 (见 _COPY_ON_WRITE), 调用方的修改不会影响共享数据
+    v = version(db_path)
+    key = (os.path.abspath(db_path), kind)
+    with _cache_lock:
+        hit = _cache.get(key)
+        build_lock = _build_locks.setdefault(key, threading.Lock())
+    if hit is None or hit[0] < v:
+        # 先在全局锁外构建, 再发布; 等同一项的会话拿到锁后直接用刚发布的结果
+        with build_lock:
+            with _cache_lock: hit = _cache.get(key)
+            if hit is None or hit[0] < v:
+                hit = (v, loader(db_path))
+                with _cache_lock:
+                    # 构建期间库又被写入: 结果只给本次调用, 不发布过期数据
+                    if _versions[key[0]][0] == v: _cache[key] = hit
+    return hit[1].copy(deep=not _COPY_ON_WRITE) if isinstance(hit[1], (pd.DataFrame, pd.Series)) else hit[1]
+
+def derived(name, build, db_path=CATALOG_DB_FILE):
+    # 依赖商品库的派生结果 (例如首页表格带缩略图的底表): 每个库版本构建一次, 各会话共享
+    return _cached(("derived", name), lambda p: build(), db_path)
+
+def load_catalog(db_path=CATALOG_DB_FILE, columns=None):
+    # columns 为列名列表时只载入这些列 (例如首页表格不需要 文案); 每种列组合单独缓存
+    cols = None if columns is None else tuple(columns)
+    return _cached(("products", cols), lambda p: _prepare(_load_products(p, cols), cols), db_path)
+
+def load_sku_frame(db_path=CATALOG_DB_FILE):
+    # 全部 SKU (类型化列), 供整库定价 / 筛选
+    return _cached("skus", _load_sku_frame, db_path)
+
+# === 3. 行级写入 (每次调用一个事务) ===
+def _clean(fields):
+    return {k: v for k, v in fields.items() if k not in TRANSIENT_COLUMNS and k not in LEGACY_COLUMNS and k not in ("id", SKU_JSON_COLUMN)}
+
+def _write_skus(conn, pid, sku_list):
+    conn.execute("DELETE FROM skus WHERE product_id=?", (int(pid),))
+    conn.executemany("INSERT INTO skus VALUES (?, ?, ?, ?, ?, ?, ?, ?)", _sku_rows(pid, sku_list))
+
+def insert_product(row, skus=None, db_path=CATALOG_DB_FILE):
+    row = _clean(row)
+    conn = connect(db_path)
+    try:
+        with conn:
+            _ensure_columns(conn, row)
+            cur = conn.execute(f"INSERT INTO products ({', '.join(_q(c) for c in row)}) VALUES ({', '.join('?' for _ in row)})",
+                               [_py(v) for v in row.values()])
+            if skus: _write_skus(conn, cur.lastrowid, skus)
+            _touch(conn)
+            return cur.lastrowid
+    finally:
+        conn.close()
+        _changed(db_path)
+
+def insert_many(rows, skus=None, db_path=CATALOG_DB_FILE):
+    # 批量新增, 单个事务提交; skus 与 rows 一一对应 (可为 None). 返回新 id 列表
+    rows = [_clean(r) for r in rows]
+    skus = skus or [None] * len(rows)
+    conn = connect(db_path)
+    try:
+        with conn:
+            _ensure_columns(conn, {c for r in rows for c in r})
+            ids = []
+            for row, sku_list in zip(rows, skus):
+                cur = conn.execute(f"INSERT INTO products ({', '.join(_q(c) for c in row)}) VALUES ({', '.join('?' for _ in row)})",
+                                   [_py(v) for v in row.values()])
+                if sku_list: conn.executemany("INSERT INTO skus VALUES (?, ?, ?, ?, ?, ?, ?, ?)", _sku_rows(cur.lastrowid, sku_list))
+                ids.append(cur.lastrowid)
+            _touch(conn)
+            return ids
+    finally:
+        conn.close()
+        _changed(db_path)
+
+def update_product(pid, fields, skus=None, db_path=CATALOG_DB_FILE):
+    # skus 不为 None 时整体替换该商品的 SKU, 与字段更新同一事务
+    fields = _clean(fields)
+    if not fields and skus is None: return
+    conn = connect(db_path)
+    try:
+        with conn:
+            if fields:
+                _ensure_columns(conn, fields)
+                conn.execute(f"UPDATE products SET {', '.join(_q(c) + '=?' for c in fields)} WHERE id=?",
+                             [_py(v) for v in fields.values()] + [int(pid)])
+            if skus is not None: _write_skus(conn, pid, skus)
+            _touch(conn)
+    finally:
+        conn.close()
+        _changed(db_path)
+
+def replace_skus(pid, skus, db_path=CATALOG_DB_FILE):
+    update_product(pid, {}, skus=skus, db_path=db_path)
+
+def update_many(updates, db_path=CATALOG_DB_FILE):
+    # {id: {列: 值}} 批量更新, 单个事务提交
+    conn = connect(db_path)
+    try:
+        with conn:
+            _ensure_columns(conn, {c for fields in updates.values() for c in fields})
+            # 相同列组合的更新合并为一次 executemany
+            groups = {}
+            for pid, fields in updates.items():
+                fields = _clean(fields)
+                if fields: groups.setdefault(tuple(fields), []).append([_py(v) for v in fields.values()] + [int(pid)])
+            for cols, params in groups.items():
+                conn.executemany(f"UPDATE products SET {', '.join(_q(c) + '=?' for c in cols)} WHERE id=?", params)
+            _touch(conn)
+    finally:
+        conn.close()
+        _changed(db_path)
+
+def delete_product(pid, db_path=CATALOG_DB_FILE):
+    conn = connect(db_path)
+    try:
+        with conn:
+            conn.execute("DELETE FROM products WHERE id=?", (int(pid),))
+            _touch(conn)
+    finally:
+        conn.close()
+        _changed(db_path)
+
+# === 4. CSV 导出 (兼容旧流程, 先写临时文件再原子替换) ===
+def export_csv(csv_path=MASTER_DB_FILE, db_path=CATALOG_DB_FILE):
+    df = load_frame(db_path)
+    skus = _load_sku_frame(db_path)
+    # 一次遍历按商品归组 (逐商品 groupby 切子表在大库上很慢)
+    grouped = {}
+    for pid, *vals in skus[["product_id"] + SKU_COLUMNS].itertuples(index=False):
+        grouped.setdefault(pid, []).append(dict(zip(SKU_COLUMNS, map(_py, vals))))
+    sku_json = {pid: json.dumps(v) for pid, v in grouped.items()}
+    pos = df.columns.get_loc("Shopee竞品链接") + 1 if "Shopee竞品链接" in df.columns else len(df.columns)
+    df.insert(pos, SKU_JSON_COLUMN, [sku_json.get(pid, "[]") for pid in df.index])
+    tmp = csv_path + ".tmp"
+    df.to_csv(tmp, index=False, encoding='utf-8-sig')
+    os.replace(tmp, csv_path)
+    return len(df)
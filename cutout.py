@@ -0,0 +1,100 @@
+import os
+import sys
+import argparse
+import threading
+import importlib.util
+import multiprocessing
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+# === 抠图设置 ===
+MODEL_NAME = "isnet-general-use"
+IMAGE_EXTS = (".jpg", ".jpeg", ".png", ".webp")
+DEFAULT_WORKERS = max(1, min(os.cpu_count() or 1, 4))   # 每个进程常驻一份模型, 不宜过多
+
+# index 为输入顺序; data 为 PNG 字节, 失败时为 None 并带 error
+CutoutResult = namedtuple("CutoutResult", ["index", "name", "data", "error"])
+
+# === 1. 进程级共享模型: 首次使用时才导入 rembg / 加载 ONNX ===
+_session = None
+_session_lock = threading.Lock()
+
+def available():
+    return importlib.util.find_spec("rembg") is not None
+
+def is_loaded():
+    return _session is not None
+
+def get_shared_session(model_name=MODEL_NAME):
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                from rembg import new_session
+                _session = new_session(model_name)
+    return _session
+
+def warm_up(model_name=MODEL_NAME):
+    # 可选: 后台线程预加载, 不阻塞当前渲染
+    if _session is None:
+        threading.Thread(target=get_shared_session, args=(model_name,), daemon=True, name="rembg-warmup").start()
+
+# 工作进程: 每个进程只加载一次模型
+def _worker_init(model_name, threads):
+    global _session
+    os.environ["OMP_NUM_THREADS"] = str(threads)   # 避免多进程 × 多线程抢占 CPU
+    from rembg import new_session
+    _session = new_session(model_name)
+
+def _cut(index, name, data, session=None):
+    from rembg import remove
+    try: return CutoutResult(index, name, remove(data, session=session or _session), None)
+    except Exception as e: return CutoutResult(index, name, None, f"{type(e).__name__}: {e}")
+
+# === 2. 批量接口: 按完成顺序流式返回, 调用方按 index 归位 ===
+def batch_remove(items, workers=DEFAULT_WORKERS, model_name=MODEL_NAME, session=None):
+    # items: [(name, bytes), ...]; 传入 session 或 workers<=1 时在当前进程内串行处理 (默认用共享模型)
+    items = list(items)
+    if not items: return
+    if session is not None or workers <= 1 or len(items) == 1:
+        session = session or get_shared_session(model_name)
+        for i, (name, data) in enumerate(items): yield _cut(i, name, data, session)
+        return
+
+    workers = min(workers, len(items))
+    threads = max(1, (os.cpu_count() or 1) // workers)
+    ctx = multiprocessing.get_context("spawn")   # 不 fork Streamlit 服务进程
+    with ProcessPoolExecutor(workers, mp_context=ctx, initializer=_worker_init, initargs=(model_name, threads)) as ex:
+        futures = [ex.submit(_cut, i, name, data) for i, (name, data) in enumerate(items)]
+        for fut in as_completed(futures):
+            yield fut.result()
+
+def read_folder(folder):
+    names = sorted(n for n in os.listdir(folder) if n.lower().endswith(IMAGE_EXTS))
+    for n in names:
+        with open(os.path.join(folder, n), "rb") as f: yield n, f.read()
+
+# === 命令行: python cutout.py 输入目录 输出目录 ===
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="批量抠图 (多进程)")
+    parser.add_argument("src")
+    parser.add_argument("dst")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS)
+    parser.add_argument("--model", default=MODEL_NAME)
+    args = parser.parse_args(argv)
+
+    os.makedirs(args.dst, exist_ok=True)
+    items = list(read_folder(args.src))
+    failed = 0
+    for done, res in enumerate(batch_remove(items, args.workers, args.model), 1):
+        if res.error:
+            failed += 1
+            print(f"[{done}/{len(items)}] ❌ {res.name}: {res.error}", file=sys.stderr)
+            continue
+        out = os.path.join(args.dst, os.path.splitext(res.name)[0] + ".png")
+        with open(out, "wb") as f: f.write(res.data)
+        print(f"[{done}/{len(items)}] ✅ {res.name}")
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,241 @@
+import os
+import sys
+import time
+import shutil
+import hashlib
+import threading
+import argparse
+from io import BytesIO
+from concurrent.futures import ThreadPoolExecutor
+from PIL import Image, ImageOps, ImageCms
+import catalog_store
+
+# === 存储设置 ===
+DB_IMG_FOLDER = "db_images"
+GC_GRACE_SECONDS = 3600   # 新写入但尚未入库的图片, 在宽限期内不回收
+IO_WORKERS = 8
+MASTER_MAX_SIDE = 1600               # 入库原图最长边上限
+VARIANT_DIR = "variants"             # db_images/variants/<原图名>_<尺寸>.webp
+VARIANT_SIZES = (120, 360, 800)      # 表格缩略图 / 画廊卡片 / 详情页
+JPEG_QUALITY = 90
+WEBP_QUALITY = 80
+
+# === 1. 路径工具 ===
+def normalize_path(raw_path):
+    # 兼容 Windows 路径 / 绝对路径, 统一为 db_images/xxx
+    path_str = str(raw_path or "").replace("\\", "/")
+    if not path_str or path_str == "nan" or path_str == "0": return ""
+    if DB_IMG_FOLDER in path_str:
+        return DB_IMG_FOLDER + path_str.split(DB_IMG_FOLDER)[-1]
+    return path_str
+
+def file_digest(path, chunk=1 << 20):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(chunk), b""): h.update(block)
+    return h.hexdigest()
+
+def _content_path(digest, ext, folder):
+    return f"{folder}/{digest}{ext}"
+
+def _tmp_path(path):
+    # 每个进程 + 线程一个临时名, 并发写同一目标时互不覆盖 / 抢删
+    return f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+
+def _publish(tmp, path):
+    # 文件名由内容决定: 替换失败但目标已在 (别的线程 / 进程刚写完同样内容) 即视为成功
+    try: os.replace(tmp, path)
+    except OSError:
+        if not os.path.exists(path): raise
+        try: os.remove(tmp)
+        except OSError: pass
+
+# === 2. 写入: 以内容哈希命名, 相同字节只写一次 ===
+def save_bytes(data, ext=".png", folder=DB_IMG_FOLDER):
+    path = _content_path(hashlib.sha256(data).hexdigest(), ext, folder)
+    if not os.path.exists(path):
+        os.makedirs(folder, exist_ok=True)
+        tmp = _tmp_path(path)
+        with open(tmp, "wb") as f: f.write(data)
+        _publish(tmp, path)
+    return path
+
+def save_image(img, folder=DB_IMG_FOLDER):
+    return ingest(img, folder)
+
+# === 2.1 入库规范化: 方向 / sRGB / 去元数据 / 限制分辨率, 并生成 WebP 多尺寸 ===
+def _to_srgb(img):
+    icc = img.info.get("icc_profile")
+    if not icc: return img
+    try:
+        src = ImageCms.ImageCmsProfile(BytesIO(icc))
+        mode = "RGBA" if "A" in img.getbands() else "RGB"
+        return ImageCms.profileToProfile(img.convert(mode), src, ImageCms.createProfile("sRGB"), outputMode=mode)
+    except Exception: return img
+
+def normalize_image(img):
+    img = ImageOps.exif_transpose(img)
+    img = _to_srgb(img)
+    has_alpha = "A" in img.getbands() or (img.mode == "P" and "transparency" in img.info)
+    img = img.convert("RGBA" if has_alpha else "RGB")
+    # 全不透明的 RGBA (常见于截图) 按普通照片处理
+    if has_alpha and img.getchannel("A").getextrema()[0] == 255: img = img.convert("RGB")
+    img.thumbnail((MASTER_MAX_SIDE, MASTER_MAX_SIDE), Image.LANCZOS)
+    return img
+
+def prepare(src):
+    # src: PIL 图片 / bytes / 路径 → (规范化后的图片, 编码字节, 扩展名); 抠图 (透明) 存 PNG, 其余存 JPEG
+    if isinstance(src, Image.Image): img = normalize_image(src)
+    else:
+        with Image.open(BytesIO(src) if isinstance(src, (bytes, bytearray)) else src) as raw: img = normalize_image(raw)
+    buf = BytesIO()
+    if img.mode == "RGBA":
+        img.save(buf, "PNG", optimize=True)
+        return img, buf.getvalue(), ".png"
+    img.save(buf, "JPEG", quality=JPEG_QUALITY, optimize=True, progressive=True)
+    return img, buf.getvalue(), ".jpg"
+
+def ingest(src, folder=DB_IMG_FOLDER):
+    img, data, ext = prepare(src)
+    path = save_bytes(data, ext, folder)
+    write_variants(path, img)
+    return path
+
+def variant_path(master_path, size):
+    head, name = os.path.split(str(master_path).replace("\\", "/"))
+    return f"{head or '.'}/{VARIANT_DIR}/{os.path.splitext(name)[0]}_{size}.webp"
+
+def write_variants(master_path, img=None):
+    missing = [s for s in VARIANT_SIZES if not os.path.exists(variant_path(master_path, s))]
+    if not missing: return
+    if img is None:
+        with Image.open(master_path) as raw: img = normalize_image(raw)
+    os.makedirs(os.path.dirname(variant_path(master_path, missing[0])), exist_ok=True)
+    for size in missing:
+        v = img.copy()
+        v.thumbnail((size, size), Image.LANCZOS)
+        path = variant_path(master_path, size)
+        tmp = _tmp_path(path)
+        v.save(tmp, "WEBP", quality=WEBP_QUALITY, method=4)
+        _publish(tmp, path)
+
+def best_image(path, width):
+    # 能覆盖 width (像素) 的最小尺寸; 图片库里的旧图首次读取时补生成, 其余路径原样返回
+    if not path or not os.path.exists(path): return path
+    size = next((s for s in VARIANT_SIZES if s >= width), None)
+    if size is None: return path
+    v = variant_path(path, size)
+    if os.path.exists(v): return v
+    if not normalize_path(path).startswith(DB_IMG_FOLDER + "/"): return path
+    try: write_variants(path)
+    except Exception: return path
+    return v
+
+# === 3. 迁移: 合并重复图片并改写 图片路径 ===
+def reingest(folder=DB_IMG_FOLDER, db_path=catalog_store.CATALOG_DB_FILE, dry_run=True):
+    # 旧图 (大 PNG) 按 ingest 规则重新入库并改写路径; 旧文件留给 gc 回收
+    df = catalog_store.load_frame(db_path)
+    paths = {pid: normalize_path(p) for pid, p in df.get("图片路径", {}).items()}
+    todo = {p for p in paths.values() if p and os.path.exists(p)}
+    def work(path):
+        try: img, data, ext = prepare(path)
+        except Exception: return path, path, os.path.getsize(path)
+        if dry_run: return path, _content_path(hashlib.sha256(data).hexdigest(), ext, folder), len(data)
+        new = save_bytes(data, ext, folder)
+        write_variants(new, img)
+        return path, new, len(data)
+    with ThreadPoolExecutor(IO_WORKERS) as ex: done = {p: (new, size) for p, new, size in ex.map(work, sorted(todo))}
+    updates = {pid: {"图片路径": done[p][0]} for pid, p in paths.items() if p in done and done[p][0] != p}
+    if updates and not dry_run: catalog_store.update_many(updates, db_path)
+    return {"images": len(done), "rows_rewritten": len(updates),
+            "bytes_before": sum(os.path.getsize(p) for p in done), "bytes_after": sum(size for _, size in set(done.values()))}
+
+def _hash_folder(folder):
+    files = [e.path.replace("\\", "/") for e in os.scandir(folder) if e.is_file() and not e.name.endswith(".tmp")]
+    with ThreadPoolExecutor(IO_WORKERS) as ex:
+        return dict(zip(files, ex.map(file_digest, files)))
+
+def _real(path):
+    # 比较用: --folder 可能写成 ./db_images 或绝对路径, 库里是 db_images/xxx, 统一解析成真实路径
+    return os.path.normcase(os.path.realpath(path))
+
+def dedupe(folder=DB_IMG_FOLDER, db_path=catalog_store.CATALOG_DB_FILE, dry_run=True):
+    digests = _hash_folder(folder)
+    canonical = {}
+    for path, digest in digests.items():
+        canonical.setdefault(digest, _content_path(digest, os.path.splitext(path)[1].lower(), folder))
+    by_real = {_real(p): p for p in digests}
+
+    df = catalog_store.load_frame(db_path)
+    updates = {}
+    for pid, raw in df.get("图片路径", {}).items():
+        path = normalize_path(raw)
+        found = by_real.get(_real(path)) if path else None
+        if found:
+            # 只换文件名, 目录沿用该行原来的写法
+            target = f"{os.path.dirname(path) or '.'}/{os.path.basename(canonical[digests[found]])}"
+            if target != raw: updates[pid] = {"图片路径": target}
+
+    report = {"files": len(digests), "unique": len(canonical), "rows_rewritten": len(updates), "removed": 0, "bytes_freed": 0}
+    if dry_run: return report
+
+    # 先落地规范文件, 再改库, 最后删除冗余副本 (任一步中断都不会丢图)
+    for path, digest in digests.items():
+        target = canonical[digest]
+        if not os.path.exists(target): shutil.copyfile(path, target)
+    if updates: catalog_store.update_many(updates, db_path)
+    keep = {_real(p) for p in canonical.values()} | {_real(p) for p in referenced_paths(db_path)}
+    for path in digests:
+        # 改库后仍被任何商品引用的文件一律不删
+        if _real(path) not in keep and os.path.exists(path):
+            report["bytes_freed"] += os.path.getsize(path)
+            os.remove(path)
+            report["removed"] += 1
+    return report
+
+# === 4. 回收: 删除没有任何商品引用的图片 ===
+def referenced_paths(db_path=catalog_store.CATALOG_DB_FILE):
+    df = catalog_store.load_frame(db_path)
+    return {normalize_path(p) for p in df.get("图片路径", [])} - {""}
+
+def find_orphans(folder=DB_IMG_FOLDER, referenced=None, grace=GC_GRACE_SECONDS):
+    referenced = referenced_paths() if referenced is None else referenced
+    real_refs = {_real(p) for p in referenced}
+    now = time.time()
+    def check(entry):
+        path = f"{folder}/{entry.name}"
+        if _real(entry.path) in real_refs or entry.name.endswith(".tmp"): return None
+        st = entry.stat()
+        return (path, st.st_size) if now - st.st_mtime > grace else None
+    entries = [e for e in os.scandir(folder) if e.is_file()]
+    with ThreadPoolExecutor(IO_WORKERS) as ex:
+        orphans = [r for r in ex.map(check, entries) if r]
+    # 尺寸图: 对应原图不再被引用即回收
+    stems = {os.path.splitext(os.path.basename(p))[0] for p in referenced}
+    vdir = f"{folder}/{VARIANT_DIR}"
+    if os.path.isdir(vdir):
+        orphans += [(f"{vdir}/{e.name}", e.stat().st_size) for e in os.scandir(vdir)
+                    if e.is_file() and e.name.rsplit("_", 1)[0] not in stems and now - e.stat().st_mtime > grace]
+    return orphans
+
+def gc_orphans(folder=DB_IMG_FOLDER, db_path=catalog_store.CATALOG_DB_FILE, dry_run=True, grace=GC_GRACE_SECONDS):
+    orphans = find_orphans(folder, referenced_paths(db_path), grace)
+    if not dry_run:
+        with ThreadPoolExecutor(IO_WORKERS) as ex: list(ex.map(lambda o: os.remove(o[0]), orphans))
+    return {"orphans": len(orphans), "bytes": sum(s for _, s in orphans), "removed": 0 if dry_run else len(orphans)}
+
+# === 命令行 ===
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="db_images 去重 / 孤儿图片回收 / 重新压缩入库")
+    parser.add_argument("command", choices=["dedupe", "gc", "reingest"])
+    parser.add_argument("--folder", default=DB_IMG_FOLDER)
+    parser.add_argument("--db", default=catalog_store.CATALOG_DB_FILE)
+    parser.add_argument("--apply", action="store_true", help="实际执行 (默认仅预览)")
+    args = parser.parse_args(argv)
+    if args.command == "dedupe": report = dedupe(args.folder, args.db, dry_run=not args.apply)
+    elif args.command == "reingest": report = reingest(args.folder, args.db, dry_run=not args.apply)
+    else: report = gc_orphans(args.folder, args.db, dry_run=not args.apply)
+    for k, v in report.items(): print(f"{k}: {v}")
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,151 @@
+import os
+import sys
+import csv
+import zipfile
+import argparse
+import pandas as pd
+import catalog_store
+import image_store
+import rates
+from pricing import channel_names, DIM_COLUMNS
+from reprice import iter_priced
+
+# === 平台批量上架导出 (Shopee 批量上传表 / 独立站商品 CSV + 图片 ZIP) ===
+# 例: python marketplace_export.py --layout shopee --layout storefront --rate auto --out export/
+# 逐块定价、逐行写出, 图片逐个从磁盘写进 ZIP; 整表 / 整个压缩包都不会驻留内存
+EXPORT_DIR = "export"
+IMAGE_ARC_DIR = "images"
+DEFAULT_STOCK = 99
+
+SHOPEE_COLUMNS = ["Category", "Product Name", "Product Description", "Parent SKU", "Variation Integration No.",
+                  "Variation Name1", "Option for Variation 1", "Price", "Stock", "SKU", "Cover image",
+                  "Weight", "Length", "Width", "Height"]
+STOREFRONT_COLUMNS = ["Handle", "Title", "Body (HTML)", "Published", "Option1 Name", "Option1 Value", "Variant SKU",
+                      "Variant Grams", "Variant Inventory Qty", "Variant Price", "Variant Compare At Price", "Image Src"]
+
+def image_name(raw_path):
+    # 图片在 ZIP 内的路径; 图片库按内容命名, 文件名即可唯一
+    path = image_store.normalize_path(raw_path)
+    return f"{IMAGE_ARC_DIR}/{os.path.basename(path)}" if path and os.path.isfile(path) else ""
+
+def _esc(text):
+    return str(text).replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;")
+
+# === 1. 各平台的行格式: (商品, SKU 定价结果, 图片) -> 一行 ===
+def _shopee_row(p, s, image, stock):
+    return [p["类目"], p["商品"], p["文案"], f"P{p['id']}", p["id"], "规格", s.name, round(float(s.final_price), 2),
+            stock, f"P{p['id']}-{s.sku_idx + 1}", image, round(float(s.weight), 3),
+            *(round(float(p[c]), 1) for c in DIM_COLUMNS)]
+
+def _storefront_row(p, s, image, stock):
+    # 同一商品的变体行连续排列, 标题 / 描述 / 主图只写在第一行
+    first = s.sku_idx == 0
+    comp = round(float(s.comp_price), 2) if s.comp_price > s.final_price else ""
+    return [f"p{p['id']}", p["商品"] if first else "", _esc(p["文案"]).replace("\n", "<br>") if first else "",
+            "TRUE" if first else "", "规格", s.name, f"P{p['id']}-{s.sku_idx + 1}", int(round(float(s.weight) * 1000)),
+            stock, round(float(s.final_price), 2), comp, image if first else ""]
+
+LAYOUTS = {"shopee": (SHOPEE_COLUMNS, _shopee_row), "storefront": (STOREFRONT_COLUMNS, _storefront_row)}
+
+# === 2. 逐行生成 ===
+def iter_rows(layout, rate, channel, domestic=0.0, db_path=catalog_store.CATALOG_DB_FILE, image_url="", stock=DEFAULT_STOCK, category=""):
+    # image_url 不为空时图片列写 image_url + ZIP 内文件名 (图片已传到图床 / 店铺后台); 否则写 ZIP 内路径
+    _, build = LAYOUTS[layout]
+    df = catalog_store.load_catalog(db_path)
+    if df.empty: return
+    skus = catalog_store.load_sku_frame(db_path)
+    order = pd.Series(range(len(df)), index=df.index)
+    for priced in iter_priced(df, skus, rate, channel, domestic):
+        # 每块内按商品在库中的顺序 (最新在前), 同一商品的 SKU 连续
+        priced = priced.assign(_pos=priced["product"].map(order)).sort_values(["_pos", "sku_idx"], kind="stable")
+        info = df.loc[priced["product"].unique()]
+        products = {pid: {**row, "id": pid, "类目": category} for pid, row in zip(info.index, info.to_dict("records"))}
+        for s in priced.itertuples(index=False):
+            p = products[s.product]
+            image = image_name(p.get("图片路径", ""))
+            yield build(p, s, image_url + image.split("/", 1)[-1] if image and image_url else image, stock)
+
+def iter_images(db_path=catalog_store.CATALOG_DB_FILE):
+    # (磁盘路径, ZIP 内路径), 去重; 缺失的图片跳过
+    seen = set()
+    for raw in catalog_store.load_catalog(db_path, columns=["图片路径"]).get("图片路径", []):
+        name = image_name(raw)
+        if name and name not in seen:
+            seen.add(name)
+            yield image_store.normalize_path(raw), name
+
+# === 3. 写盘 (先写临时文件再原子替换; 中途出错则删掉临时文件, 不留半截) ===
+def _discard(tmp):
+    try: os.remove(tmp)
+    except OSError: pass
+
+def write_csv(path, columns, rows):
+    n, tmp = 0, path + ".tmp"
+    try:
+        with open(tmp, "w", encoding="utf-8-sig", newline="") as f:
+            w = csv.writer(f)
+            w.writerow(columns)
+            for row in rows:
+                w.writerow(row)
+                n += 1
+        os.replace(tmp, path)
+    finally: _discard(tmp)
+    return n
+
+def write_zip(path, items):
+    # JPEG / PNG / WebP 本身已压缩, 直接存储; ZipFile.write 按块复制, 不整文件读入
+    n, tmp = 0, path + ".tmp"
+    try:
+        with zipfile.ZipFile(tmp, "w", zipfile.ZIP_STORED, allowZip64=True) as zf:
+            for src, arcname in items:
+                zf.write(src, arcname)
+                n += 1
+        os.replace(tmp, path)
+    finally: _discard(tmp)
+    return n
+
+def run_export(out_dir, layouts, rate, channel, domestic=0.0, images=True, db_path=catalog_store.CATALOG_DB_FILE, **kwargs):
+    os.makedirs(out_dir, exist_ok=True)
+    report = {"files": [], "rows": {}, "images": 0}
+    for layout in layouts:
+        path = os.path.join(out_dir, f"{layout}.csv")
+        report["rows"][layout] = write_csv(path, LAYOUTS[layout][0], iter_rows(layout, rate, channel, domestic, db_path, **kwargs))
+        report["files"].append(path)
+    if images:
+        path = os.path.join(out_dir, "images.zip")
+        report["images"] = write_zip(path, iter_images(db_path))
+        report["files"].append(path)
+    return report
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="导出平台批量上架表格 + 图片包")
+    parser.add_argument("--layout", action="append", choices=list(LAYOUTS), help="可重复; 默认全部")
+    parser.add_argument("--rate", default="auto", help="SGD→CNY 汇率; auto 为实时汇率 (获取失败且无有效缓存时退出)")
+    parser.add_argument("--channel", default="空运普货 (Legion)", choices=channel_names("air"))
+    parser.add_argument("--domestic", type=float, default=0.0, help="国内运费 (RMB)")
+    parser.add_argument("--stock", type=int, default=DEFAULT_STOCK)
+    parser.add_argument("--category", default="", help="Shopee 类目 ID")
+    parser.add_argument("--image-url", default="", help="图片已上传时的 URL 前缀 (图片列写 前缀 + 文件名)")
+    parser.add_argument("--no-images", action="store_true", help="不打包图片")
+    parser.add_argument("--out", default=EXPORT_DIR)
+    parser.add_argument("--db", default=catalog_store.CATALOG_DB_FILE)
+    args = parser.parse_args(argv)
+
+    if args.rate == "auto":
+        rates.refresh(wait=10)
+        rate = rates.get_rate()
+        if not rates.is_fresh():
+            # 导出的售价会直接上架, 不用默认值 / 过期缓存悄悄算
+            info = rates.status()
+            parser.error(f"实时汇率不可用 ({info['error'] or '刷新超时'}), 当前 {rate:.4f} 来自{'默认值' if info['rate'] is None else '过期缓存'}; 请用 --rate 指定数值")
+    else: rate = float(args.rate)
+
+    report = run_export(args.out, args.layout or list(LAYOUTS), rate, args.channel, args.domestic, not args.no_images, args.db,
+                        image_url=args.image_url, stock=args.stock, category=args.category)
+    rows = " / ".join(f"{k} {v} 行" for k, v in report["rows"].items())
+    print(f"汇率 {rate:.4f} · {args.channel} · {rows} · 图片 {report['images']} 张", file=sys.stderr)
+    for path in report["files"]: print(path)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,93 @@
+import os
+import json
+import time
+import uuid
+import threading
+from contextlib import contextmanager
+
+# === 每次重跑的耗时统计 ===
+# 用法: start_run(视图) → with span("load_data"): ... → finish_run() 写一行 JSON 到日志
+PERF_LOG_FILE = os.path.join(".cache", "perf.jsonl")   # 设为 None 则只在面板显示, 不写日志
+MAX_LOG_BYTES = 8 * 1024 * 1024                       # 超出后轮转为 perf.jsonl.1
+
+_local = threading.local()    # Streamlit 每个会话的脚本在各自线程中运行
+_log_lock = threading.Lock()
+
+class Run:
+    def __init__(self, view, **meta):
+        self.run_id = uuid.uuid4().hex[:12]
+        self.started = time.time()
+        self.t0 = time.perf_counter()
+        self.view = view
+        self.meta = dict(meta)
+        self.spans = {}         # 名称 -> [总秒数, 次数]
+        self.total = None
+
+    def add(self, name, seconds):
+        s = self.spans.setdefault(name, [0.0, 0])
+        s[0] += seconds
+        s[1] += 1
+
+    def record(self, interrupted=False):
+        return {"run_id": self.run_id, "ts": round(self.started, 3), "view": self.view, **self.meta,
+                "total_ms": round(self.total * 1000, 2), "interrupted": interrupted,
+                "spans": {k: {"ms": round(v[0] * 1000, 2), "n": v[1]} for k, v in self.spans.items()}}
+
+def current():
+    return getattr(_local, "run", None)
+
+def start_run(view, **meta):
+    # 上一轮被 st.rerun() / st.stop() 打断时没走到 finish_run, 在这里补记
+    prev = current()
+    if prev is not None and prev.total is None: finish_run(interrupted=True)
+    _local.run = Run(view, **meta)
+    return _local.run
+
+def annotate(**meta):
+    run = current()
+    if run is not None: run.meta.update(meta)
+
+@contextmanager
+def span(name):
+    run = current()
+    if run is None or run.total is not None:
+        yield
+        return
+    t = time.perf_counter()
+    try: yield
+    finally: run.add(name, time.perf_counter() - t)
+
+def timed(name):
+    def wrap(fn):
+        def inner(*args, **kwargs):
+            with span(name): return fn(*args, **kwargs)
+        inner.__name__, inner.__doc__ = fn.__name__, fn.__doc__
+        return inner
+    return wrap
+
+def finish_run(interrupted=False):
+    run = current()
+    if run is None or run.total is not None: return run
+    run.total = time.perf_counter() - run.t0
+    if PERF_LOG_FILE:
+        try: _append(run.record(interrupted))
+        except OSError: pass
+    return run
+
+def _append(record):
+    line = json.dumps(record, ensure_ascii=False) + "\n"
+    with _log_lock:
+        os.makedirs(os.path.dirname(PERF_LOG_FILE) or ".", exist_ok=True)
+        if os.path.exists(PERF_LOG_FILE) and os.path.getsize(PERF_LOG_FILE) > MAX_LOG_BYTES:
+            os.replace(PERF_LOG_FILE, PERF_LOG_FILE + ".1")
+        with open(PERF_LOG_FILE, "a", encoding="utf-8") as f: f.write(line)
+
+def span_rows(run):
+    # 面板用: 按耗时倒序, 附 "未计入" (脚本其余部分 / 渲染)
+    if run is None: return []
+    total = run.total if run.total is not None else time.perf_counter() - run.t0
+    rows = sorted(({"环节": k, "耗时(ms)": round(v[0] * 1000, 1), "次数": v[1]} for k, v in run.spans.items()),
+                  key=lambda r: -r["耗时(ms)"])
+    # 嵌套的环节会重复计入, 未计入部分不小于 0
+    rest = max(total * 1000 - sum(r["耗时(ms)"] for r in rows), 0.0)
+    return rows + [{"环节": "其他", "耗时(ms)": round(rest, 1), "次数": 1}]
@@ -0,0 +1,251 @@
+import os
+import json
+import threading
+import numpy as np
+import pandas as pd
+
+# === 定价常量 ===
+STRIPE_PCT = 0.034
+STRIPE_FIX = 0.50
+RATE_CARD_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "rate_cards.json")
+SUPPORTED_CARD_VERSIONS = {1}
+
+# === 1. 运费价目表 (rate_cards.json, 文件变更后自动重新载入) ===
+# 每个渠道: 计费重 = max(实重, 体积 / volumetric_divisor); 按 up_to 分段,
+# 段内费用 = first + max(计费重 - first_weight, 0) × per_kg, 最后不低于 min_charge
+_cards = {"sig": None, "data": None, "compiled": {}}
+_cards_lock = threading.Lock()
+
+def _compile_card(name, card):
+    tiers = sorted(card["tiers"], key=lambda t: float("inf") if t.get("up_to") is None else t["up_to"])
+    if not tiers: raise ValueError(f"渠道 {name} 没有配置运费分段")
+    arr = lambda key, default=0.0: np.array([float(t.get(key) or default) for t in tiers])
+    return {
+        "up_to": np.array([np.inf if t.get("up_to") is None else float(t["up_to"]) for t in tiers]),
+        "first": arr("first"), "first_weight": arr("first_weight"), "per_kg": arr("per_kg"),
+        "divisor": float(card.get("volumetric_divisor") or 0), "min_charge": float(card.get("min_charge") or 0),
+        "mode": card.get("mode", "air"), "tiers": tiers,
+    }
+
+def load_rate_cards(path=None):
+    path = path or RATE_CARD_FILE
+    st = os.stat(path)
+    sig = (path, st.st_mtime_ns, st.st_size)
+    with _cards_lock:
+        if _cards["sig"] != sig:
+            with open(path, encoding="utf-8") as f: data = json.load(f)
+            if data.get("version") not in SUPPORTED_CARD_VERSIONS:
+                raise ValueError(f"不支持的价目表版本: {data.get('version')}")
+            compiled = {name: _compile_card(name, card) for name, card in data["channels"].items()}
+            if data.get("sea_channel") not in compiled: raise ValueError("sea_channel 未在 channels 中定义")
+            _cards.update(sig=sig, data=data, compiled=compiled)
+        return _cards["data"], _cards["compiled"]
+
+def channel_names(mode=None):
+    _, compiled = load_rate_cards()
+    return [n for n, c in compiled.items() if mode is None or c["mode"] == mode]
+
+def sea_channel():
+    return load_rate_cards()[0]["sea_channel"]
+
+def _card(channel):
+    data, compiled = load_rate_cards()
+    return compiled.get(channel) or compiled[data["sea_channel"]]   # 未知渠道按海运计 (与旧版一致)
+
+def chargeable_weight(weights, channel, volumes=0.0):
+    c = _card(channel)
+    w = np.asarray(weights, dtype=float)
+    if c["divisor"] <= 0: return w
+    return np.maximum(w, np.asarray(volumes, dtype=float) / c["divisor"])
+
+def ship_cost_array(weights, channel, volumes=0.0):
+    # weights / volumes 可为任意形状数组 (总实重 kg / 总体积 cm³)
+    c = _card(channel)
+    cw = chargeable_weight(weights, channel, volumes)
+    i = np.minimum(np.searchsorted(c["up_to"], cw, side="left"), len(c["up_to"]) - 1)
+    cost = c["first"][i] + np.maximum(cw - c["first_weight"][i], 0) * c["per_kg"][i]
+    return np.maximum(cost, c["min_charge"])
+
+def ship_formula(weight, channel, volume=0.0):
+    # 仅在展示明细时生成的可读公式
+    c = _card(channel)
+    cw = float(chargeable_weight(weight, channel, volume))
+    t = c["tiers"][int(min(np.searchsorted(c["up_to"], cw, side="left"), len(c["tiers"]) - 1))]
+    first, fw, per_kg = t.get("first") or 0, t.get("first_weight") or 0, t.get("per_kg") or 0
+    prefix = f"体积重 {cw:.2f}kg (>实重 {weight:.2f}kg) → " if cw > weight else ""
+    body = f"¥{first}(首) + {max(cw - fw, 0):.2f}kg × ¥{per_kg}" if first else f"{cw:.2f}kg × ¥{per_kg}"
+    cost = first + max(cw - fw, 0) * per_kg
+    suffix = f" → 低消 ¥{c['min_charge']}" if cost < c["min_charge"] else ""
+    return prefix + body + suffix
+
+def get_ship_cost_cny(weight, channel, volume=0.0):
+    return float(ship_cost_array(weight, channel, volume)), ship_formula(weight, channel, volume)
+
+# === 2. 定价核心: 全部输入为等长数组 (或可广播的标量) ===
+def price_arrays(unit_cost, domestic, unit_weight, qty, profit_pct, ad_pct, rate, air_channel, manual_price=0.0, comp_price=0.0, unit_volume=0.0):
+    unit_cost, domestic, unit_weight, qty, profit_pct, ad_pct, rate, manual_price, comp_price, unit_volume = np.broadcast_arrays(
+        *[np.asarray(x, dtype=float) for x in (unit_cost, domestic, unit_weight, qty, profit_pct, ad_pct, rate, manual_price, comp_price, unit_volume)])
+
+    goods_cny = unit_cost * qty
+    weight = unit_weight * qty
+    volume = unit_volume * qty
+    air_ship_cny = ship_cost_array(weight, air_channel, volume)
+    sea_ship_cny = ship_cost_array(weight, sea_channel(), volume)
+
+    # 空运硬成本 + 建议售价倒推
+    air_hard_cny = goods_cny + domestic + air_ship_cny
+    air_hard_sgd = air_hard_cny / rate
+    denom = 1 - STRIPE_PCT - ad_pct - profit_pct
+    with np.errstate(divide='ignore', invalid='ignore'):
+        suggested = np.where(denom <= 0.01, 0.0, (air_hard_sgd + STRIPE_FIX) / denom)
+    final_price = np.where(manual_price > 0, manual_price, suggested)
+
+    # 费用 (基于最终售价)
+    stripe_fee = final_price * STRIPE_PCT + STRIPE_FIX
+    ad_fee = final_price * ad_pct
+    total_fee = stripe_fee + ad_fee
+
+    # 空运 / 海运利润 (售价相同)
+    sea_hard_cny = goods_cny + domestic + sea_ship_cny
+    sea_hard_sgd = sea_hard_cny / rate
+    air_profit_sgd = final_price - air_hard_sgd - total_fee
+    sea_profit_sgd = final_price - sea_hard_sgd - total_fee
+    safe_price = np.where(final_price > 0, final_price, 1.0)
+
+    return {
+        "weight": weight, "volume": volume, "goods_cny": goods_cny,
+        "suggested_price": suggested, "final_price": final_price,
+        "stripe_fee": stripe_fee, "ad_fee": ad_fee,
+        "air_ship_cny": air_ship_cny, "air_hard_cny": air_hard_cny, "air_hard_sgd": air_hard_sgd,
+        "air_profit_cny": air_profit_sgd * rate,
+        "air_margin": np.where(final_price > 0, air_profit_sgd / safe_price, 0.0),
+        "sea_ship_cny": sea_ship_cny, "sea_hard_cny": sea_hard_cny, "sea_hard_sgd": sea_hard_sgd,
+        "sea_profit_cny": sea_profit_sgd * rate,
+        "sea_margin": np.where(final_price > 0, sea_profit_sgd / safe_price, 0.0),
+        "comp_diff": np.where(comp_price > 0, final_price - comp_price, np.nan),
+    }
+
+def comp_status_text(diff):
+    if diff != diff: return ""
+    return f"贵 S${diff:.2f}" if diff > 0 else f"便宜 S${abs(diff):.2f}"
+
+# === 3. 单 SKU 接口 (详情页卡片 / 首页预览) ===
+def calculate_sku_variant(unit_cost, domestic, unit_weight, qty, profit_pct, ad_pct, rate, air_channel, manual_price=None, comp_price=0.0, unit_volume=0.0):
+    # 运费公式不在此生成, 需要展示时调用 ship_formula(res['weight'], 渠道, res['volume'])
+    r = {k: float(v) for k, v in price_arrays(unit_cost, domestic, unit_weight, qty, profit_pct, ad_pct, rate, air_channel,
+                                             manual_price=manual_price or 0.0, comp_price=comp_price, unit_volume=unit_volume).items()}
+    return {
+        "weight": r['weight'], "volume": r['volume'],
+        "final_price": r['final_price'],
+        "suggested_price": r['suggested_price'],
+        "comp_status": comp_status_text(r['comp_diff']),
+        "fees": {"stripe": r['stripe_fee'], "ad": r['ad_fee']},
+        "air": {
+            "ship_cny": r['air_ship_cny'],
+            "hard_cny": r['air_hard_cny'], "hard_sgd": r['air_hard_sgd'],
+            "profit_cny": r['air_profit_cny'], "margin": r['air_margin']
+        },
+        "sea": {
+            "ship_cny": r['sea_ship_cny'],
+            "hard_cny": r['sea_hard_cny'], "hard_sgd": r['sea_hard_sgd'],
+            "profit_cny": r['sea_profit_cny'], "margin": r['sea_margin']
+        },
+        "goods_cny": r['goods_cny']
+    }
+
+# === 4. 全目录定价 ===
+DIM_COLUMNS = ["长(cm)", "宽(cm)", "高(cm)"]
+
+def parse_dims(col):
+    # "长x宽x高" -> 三列 float; 格式不对的记为 0
+    dims = col.astype(str).str.extract(r'^\s*([\d.]+)\s*[xX×*]\s*([\d.]+)\s*[xX×*]\s*([\d.]+)\s*$')
+    return dims.apply(pd.to_numeric, errors='coerce').fillna(0.0).set_axis(DIM_COLUMNS, axis=1)
+
+def parse_pct_column(col, default):
+    # "15.0%" / "15" -> 15.0 (百分数); 已是数值列 (catalog_store 载入时已解析) 则不再处理字符串
+    if pd.api.types.is_numeric_dtype(col): return col.astype(float).fillna(default)
+    return pd.to_numeric(col.astype(str).str.replace('%', '', regex=False), errors='coerce').fillna(default)
+
+def _pct_series(col, default):
+    return parse_pct_column(col, default) / 100
+
+def expand_skus(df, skus):
+    # 商品表 + SKU 表 (catalog_store.load_sku_frame) -> 每个 SKU 一行; 没有 SKU 的商品补一个默认 1件装
+    col = lambda name: df[name] if name in df.columns else pd.Series('', index=df.index)
+    prod = pd.DataFrame({
+        "product": df.index,
+        "base_cost": pd.to_numeric(col('进货价'), errors='coerce').fillna(0.0).to_numpy(),
+        "unit_weight": pd.to_numeric(col('重量'), errors='coerce').fillna(0.0).to_numpy(),
+        "base_profit": _pct_series(col('目标利润率'), 30.0).to_numpy(),
+        "ad": _pct_series(col('广告占比'), 0.0).to_numpy(),
+        "unit_volume": (df[DIM_COLUMNS] if set(DIM_COLUMNS) <= set(df.columns) else parse_dims(col('包装尺寸(cm)'))).prod(axis=1).to_numpy(),
+    })
+    s = skus.rename(columns={"product_id": "product", "pos": "sku_idx"})
+    s = s[s['product'].isin(prod['product'])]
+    missing = prod[~prod['product'].isin(s['product'])]
+    default = pd.DataFrame({"product": missing['product'], "sku_idx": 0, "name": "1件装", "qty": 1,
+                            "cost": missing['base_cost'], "profit": missing['base_profit'], "fixed_price": 0.0, "comp_price": 0.0})
+    s = pd.concat([s, default], ignore_index=True) if len(default) else s.reset_index(drop=True)
+    s = s.merge(prod[["product", "unit_weight", "unit_volume", "ad"]], on="product", how="left")
+    s['qty'] = s['qty'].clip(lower=1)
+    s['unit_cost'] = s['cost'] / s['qty']
+    return s[["product", "sku_idx", "name", "qty", "unit_cost", "unit_weight", "unit_volume", "profit", "ad", "fixed_price", "comp_price"]]
+
+def price_skus(skus, rate, air_channel, domestic=0.0):
+    res = price_arrays(skus['unit_cost'], domestic, skus['unit_weight'], skus['qty'], skus['profit'], skus['ad'],
+                       rate, air_channel, manual_price=skus['fixed_price'], comp_price=skus['comp_price'], unit_volume=skus['unit_volume'])
+    return pd.concat([skus.reset_index(drop=True), pd.DataFrame(res)], axis=1)
+
+def price_catalog(df, skus, rate, air_channel, domestic=0.0):
+    return price_skus(expand_skus(df, skus), rate, air_channel, domestic)
+
+# === 5. 情景分析: 汇率 × 利润率 × 广告占比 × 渠道, 一次向量化计算 ===
+def sensitivity_grid(skus, rates, margins=None, ad_ratios=None, channels=(), domestic=0.0, use_fixed=True):
+    # skus 为 expand_skus 的结果; margins / ad_ratios 为 None 时沿用各 SKU 自身设置
+    # 返回 {渠道: {"final_price"/"profit_cny"/"margin": 形状 (SKU, 汇率, 利润率, 广告) 的数组}}
+    col = lambda name: skus[name].to_numpy(dtype=float)[:, None, None, None]
+    r = np.asarray(rates, dtype=float)[None, :, None, None]
+    m = col('profit') if margins is None else np.asarray(margins, dtype=float)[None, None, :, None]
+    a = col('ad') if ad_ratios is None else np.asarray(ad_ratios, dtype=float)[None, None, None, :]
+    manual = col('fixed_price') if use_fixed else 0.0
+    out = {}
+    for ch in channels:
+        res = price_arrays(col('unit_cost'), domestic, col('unit_weight'), col('qty'), m, a, r, ch, manual_price=manual, unit_volume=col('unit_volume'))
+        out[ch] = {"final_price": res['final_price'], "profit_cny": res['air_profit_cny'], "margin": res['air_margin']}
+    return out
+
+def grid_summary(grid, rates, margins=None, ad_ratios=None):
+    # 每个情景点: 亏损 SKU 数 / 平均利润率 / 总净赚
+    rows = []
+    margins = [None] if margins is None else list(margins)
+    ad_ratios = [None] if ad_ratios is None else list(ad_ratios)
+    for ch, res in grid.items():
+        neg = (res['profit_cny'] < 0).sum(axis=0)
+        avg = res['margin'].mean(axis=0)
+        tot = res['profit_cny'].sum(axis=0)
+        for i, rate in enumerate(rates):
+            for j, mg in enumerate(margins):
+                for k, ad in enumerate(ad_ratios):
+                    rows.append((ch, rate, mg, ad, int(neg[i, j, k]), float(avg[i, j, k]), float(tot[i, j, k])))
+    return pd.DataFrame(rows, columns=["channel", "rate", "margin", "ad", "n_negative", "avg_margin", "total_profit_cny"])
+
+def flipped_skus(skus, grid, baseline, rates, margins=None, ad_ratios=None):
+    # 当前设置下不亏 (baseline: 每个 SKU 的当前净赚, 与 skus 同序), 但在任一情景下净赚转负的 SKU, 附最差情景
+    flat = {ch: res['profit_cny'].reshape(len(skus), -1) for ch, res in grid.items()}
+    if not flat: return skus.iloc[0:0]
+    shape = next(iter(grid.values()))['profit_cny'].shape[1:]
+    stacked = np.concatenate(list(flat.values()), axis=1)
+    neg = (stacked < 0).sum(axis=1)
+    worst = stacked.argmin(axis=1)
+    ch_idx, cell = np.divmod(worst, int(np.prod(shape)))
+    i, j, k = np.unravel_index(cell, shape)
+    pick = lambda vals, idx: np.asarray([None] if vals is None else list(vals), dtype=object)[idx]
+    out = skus[["product", "sku_idx", "name", "qty"]].copy()
+    out["n_negative"] = neg
+    out["baseline_profit_cny"] = baseline = np.asarray(baseline, dtype=float)
+    out["worst_profit_cny"] = stacked.min(axis=1)
+    out["worst_channel"] = np.asarray(list(grid), dtype=object)[ch_idx]
+    out["worst_rate"] = np.asarray(rates, dtype=float)[i]
+    out["worst_margin"] = pick(margins, j)
+    out["worst_ad"] = pick(ad_ratios, k)
+    return out[(out["n_negative"] > 0) & (baseline >= 0)].sort_values("worst_profit_cny")
@@ -0,0 +1,106 @@
+import os
+import json
+import time
+import threading
+import requests
+
+# === 汇率设置 ===
+RATE_API_URL = "https://open.er-api.com/v6/latest/SGD"
+RATE_CACHE_FILE = os.path.join(".cache", "rate.json")
+DEFAULT_RATE = 5.35
+DEFAULT_TTL = 6 * 3600      # 秒; 超过即在后台刷新
+HTTP_TIMEOUT = 5
+
+_lock = threading.Lock()
+_state = {"rate": None, "fetched_at": 0.0, "source": "默认值", "error": ""}
+_config = {"source": None, "ttl": DEFAULT_TTL, "cache_file": RATE_CACHE_FILE}
+_refreshing = None
+
+# === 1. 数据源 (可替换, 便于对接本地桩服务测试) ===
+def http_source(url=RATE_API_URL, currency="CNY"):
+    def fetch():
+        resp = requests.get(url, headers={'User-Agent': 'Mozilla/5.0'}, timeout=HTTP_TIMEOUT)
+        resp.raise_for_status()
+        return float(resp.json()['rates'][currency])
+    fetch.label = url
+    return fetch
+
+def configure(source=None, ttl=None, cache_file=None):
+    global _refreshing
+    with _lock:
+        if source is not None: _config["source"] = source
+        if ttl is not None: _config["ttl"] = ttl
+        if cache_file is not None: _config["cache_file"] = cache_file
+        _state.update(rate=None, fetched_at=0.0, source="默认值", error="")
+        _refreshing = None
+
+def _source():
+    if _config["source"] is None: _config["source"] = http_source()
+    return _config["source"]
+
+# === 2. 磁盘持久化: 冷启动直接用上次成功的汇率 ===
+def _load_disk():
+    try:
+        with open(_config["cache_file"], encoding="utf-8") as f: data = json.load(f)
+        _state.update(rate=float(data["rate"]), fetched_at=float(data["fetched_at"]), source=data.get("source", "缓存"))
+    except Exception: pass
+
+def _save_disk():
+    path = _config["cache_file"]
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump({"rate": _state["rate"], "fetched_at": _state["fetched_at"], "source": _state["source"]}, f)
+    os.replace(tmp, path)
+
+# === 3. 后台刷新 (同一时刻只跑一个) ===
+def _do_refresh():
+    global _refreshing
+    src = _source()
+    try:
+        rate = src()
+        with _lock:
+            _state.update(rate=rate, fetched_at=time.time(), source=getattr(src, "label", "自定义"), error="")
+            try: _save_disk()
+            except OSError: pass
+    except Exception as e:
+        with _lock: _state["error"] = f"{type(e).__name__}: {e}"
+    finally:
+        with _lock: _refreshing = None
+
+def refresh(wait=0.0):
+    # 触发后台刷新; wait>0 时最多等待该秒数
+    global _refreshing
+    with _lock:
+        t = _refreshing
+        if t is None:
+            t = _refreshing = threading.Thread(target=_do_refresh, daemon=True, name="rate-refresh")
+            t.start()
+    if wait > 0: t.join(wait)
+
+def get_rate():
+    # 永不阻塞: 内存 → 磁盘 → 默认值; 过期则在后台刷新
+    with _lock:
+        if _state["rate"] is None: _load_disk()
+        rate, fetched_at = _state["rate"], _state["fetched_at"]
+        stale = rate is None or time.time() - fetched_at > _config["ttl"]
+    if stale: refresh()
+    return rate if rate is not None else DEFAULT_RATE
+
+def status():
+    with _lock: s = dict(_state)
+    s["age"] = time.time() - s["fetched_at"] if s["fetched_at"] else None
+    s["refreshing"] = _refreshing is not None
+    return s
+
+def is_fresh(s=None):
+    # 最近一次获取成功, 或磁盘缓存仍在有效期内; 默认值 / 过期缓存都不算
+    s = status() if s is None else s
+    return s["rate"] is not None and s["age"] is not None and s["age"] <= _config["ttl"]
+
+def describe_age(age):
+    if age is None: return "未获取 (使用默认值)"
+    if age < 60: return "刚刚更新"
+    if age < 3600: return f"{age/60:.0f} 分钟前"
+    if age < 86400: return f"{age/3600:.1f} 小时前"
+    return f"{age/86400:.1f} 天前"
@@ -0,0 +1,109 @@
+import os
+import sys
+import csv
+import json
+import argparse
+import catalog_store
+import rates
+from pricing import channel_names, price_catalog
+
+# === 整库重新定价 (无界面, 可用于定时任务) ===
+# 例: python reprice.py --rate auto --channel "空运普货 (Legion)" --out prices.csv --apply
+CHUNK_SIZE = 2000
+OUTPUT_COLUMNS = ["product", "商品", "sku_idx", "name", "qty", "weight", "suggested_price", "final_price",
+                  "air_hard_cny", "air_profit_cny", "air_margin", "sea_profit_cny", "sea_margin", "stripe_fee", "ad_fee"]
+
+def iter_priced(df, skus, rate, channel, domestic=0.0, ad_pct=None, chunk_size=CHUNK_SIZE):
+    # 按商品分块定价, 逐块产出, 输出不必整表驻留内存
+    if ad_pct is not None:
+        df = df.copy()
+        df["广告占比"] = float(ad_pct)
+    for start in range(0, len(df), chunk_size):
+        part = df.iloc[start:start + chunk_size]
+        priced = price_catalog(part, skus[skus["product_id"].isin(part.index)], rate, channel, domestic)
+        priced["商品"] = part["商品"].reindex(priced["product"]).to_numpy()
+        yield priced
+
+def summary_updates(priced):
+    # 首个 SKU 决定主表的 空运售价 / 真实售价 / 硬成本 (与详情页保存逻辑一致)
+    first = priced[priced["sku_idx"] == 0]
+    return {int(r.product): {"空运售价(SGD)": round(float(r.suggested_price), 2),
+                             "真实售价": round(float(r.final_price), 2),
+                             "硬成本(RMB)": round(float(r.air_hard_cny), 2)}
+            for r in first.itertuples(index=False)}
+
+class _Writer:
+    # csv / json (数组) / jsonl, 按块追加写出
+    def __init__(self, path):
+        self.path = path
+        self.fmt = "jsonl" if path.endswith(".jsonl") else "json" if path.endswith(".json") else "csv"
+        self.f = sys.stdout if path == "-" else open(path + ".tmp", "w", encoding="utf-8-sig" if self.fmt == "csv" else "utf-8", newline="")
+        self.first = True
+        if self.fmt == "csv":
+            self.csv = csv.writer(self.f)
+            self.csv.writerow(OUTPUT_COLUMNS)
+        elif self.fmt == "json": self.f.write("[\n")
+
+    def write(self, chunk):
+        rows = chunk[OUTPUT_COLUMNS].round(4).itertuples(index=False)
+        if self.fmt == "csv":
+            self.csv.writerows(rows)
+            return
+        for r in rows:
+            line = json.dumps(dict(zip(OUTPUT_COLUMNS, (v.item() if hasattr(v, "item") else v for v in r))), ensure_ascii=False)
+            if self.fmt == "json": line = ("" if self.first else ",\n") + line
+            self.f.write(line if self.fmt == "json" else line + "\n")
+            self.first = False
+
+    def close(self, ok=True):
+        # 只有完整写完才替换目标文件; 中途出错删掉临时文件, 不发布半张价目表
+        if self.fmt == "json" and ok: self.f.write("\n]\n")
+        if self.f is not sys.stdout:
+            self.f.close()
+            if ok: os.replace(self.path + ".tmp", self.path)
+            else:
+                try: os.remove(self.path + ".tmp")
+                except OSError: pass
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="整库重新定价")
+    parser.add_argument("--rate", default="auto", help="SGD→CNY 汇率; auto 为实时汇率 (失败时用缓存 / 默认值, 此时拒绝 --apply)")
+    parser.add_argument("--channel", default="空运普货 (Legion)", choices=channel_names("air"))
+    parser.add_argument("--ad", type=float, default=None, help="广告占比 (%%), 覆盖每个商品自己的设置")
+    parser.add_argument("--domestic", type=float, default=0.0, help="国内运费 (RMB)")
+    parser.add_argument("--out", default=None, help="输出文件 (.csv / .json / .jsonl, - 为标准输出)")
+    parser.add_argument("--apply", action="store_true", help="写回 空运售价(SGD) / 硬成本(RMB) / 真实售价")
+    parser.add_argument("--db", default=catalog_store.CATALOG_DB_FILE)
+    args = parser.parse_args(argv)
+
+    if args.rate == "auto":
+        rates.refresh(wait=10)
+        rate = rates.get_rate()
+        if not rates.is_fresh():
+            info = rates.status()
+            msg = f"实时汇率不可用 ({info['error'] or '刷新超时'}), 当前 {rate:.4f} 来自{'默认值' if info['rate'] is None else '过期缓存'}"
+            # 写回会按这个汇率改掉整库售价, 必须显式指定
+            if args.apply: parser.error(msg + "; --apply 需用 --rate 指定数值")
+            print("⚠️ " + msg, file=sys.stderr)
+    else:
+        try: rate = float(args.rate)
+        except ValueError: parser.error(f"--rate 应为数值或 auto: {args.rate}")
+
+    df = catalog_store.load_catalog(args.db)
+    skus = catalog_store.load_sku_frame(args.db)
+    writer = _Writer(args.out) if args.out else None
+    updates, n_skus, ok = {}, 0, False
+    try:
+        for chunk in iter_priced(df, skus, rate, args.channel, args.domestic, args.ad):
+            n_skus += len(chunk)
+            if writer: writer.write(chunk)
+            if args.apply: updates.update(summary_updates(chunk))
+        ok = True
+    finally:
+        if writer: writer.close(ok)
+    if args.apply: catalog_store.update_many(updates, args.db)   # 单个事务整体提交
+    print(f"汇率 {rate:.4f} · {args.channel} · {len(df)} 个商品 / {n_skus} 个 SKU" + (" · 已写回" if args.apply else ""), file=sys.stderr)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,122 @@
+import re
+import threading
+import unicodedata
+from collections import defaultdict
+
+# 可选: 安装 pypinyin 后支持拼音全拼 / 首字母检索
+try:
+    from pypinyin import lazy_pinyin, Style
+except ImportError:
+    lazy_pinyin = None
+
+SKU_CODE_RE = re.compile(r'^\s*(\d+(?:\.\d+)?)')
+ASCII_WORD_RE = re.compile(r'^[a-z]+$')
+FIELD_WEIGHT = {"t": 1.0, "p": 0.8, "i": 0.6}   # 标题 / 拼音全拼 / 拼音首字母
+
+def normalize(text):
+    return unicodedata.normalize("NFKC", str(text)).lower().strip()
+
+def _grams(s):
+    # 单字 + 双字 n-gram; 查询词的全部 n-gram 都命中才可能是子串
+    return set(s) | {s[i:i + 2] for i in range(len(s) - 1)}
+
+def _fields(text):
+    t = normalize(text)
+    fields = {"t": t}
+    if lazy_pinyin is not None:
+        han = [c for c in t if '一' <= c <= '鿿']
+        if han:
+            fields["p"] = "".join(lazy_pinyin(han))
+            fields["i"] = "".join(lazy_pinyin(han, style=Style.FIRST_LETTER))
+    return fields
+
+# === 倒排索引: 每个目录版本构建一次, 之后按商品增量更新 ===
+class SearchIndex:
+    def __init__(self):
+        self.docs = {}          # id -> {字段: 文本}
+        self.codes = {}         # id -> 开头 SKU 编号 (如 004 / 020.1)
+        self.postings = defaultdict(set)
+        self.order = {}         # id -> 目录中的位置, 同分时保持原顺序
+        self.version = None
+        self.lock = threading.RLock()   # 进程内多个会话共享同一索引
+
+    def __len__(self): return len(self.docs)
+
+    def add(self, doc_id, text):
+        with self.lock: self._add(doc_id, text)
+
+    def _add(self, doc_id, text):
+        if doc_id in self.docs: self._remove(doc_id)
+        fields = _fields(text)
+        self.docs[doc_id] = fields
+        m = SKU_CODE_RE.match(fields["t"])
+        if m:
+            self.codes[doc_id] = m.group(1)
+            self.postings["code:" + m.group(1)].add(doc_id)
+        for f, s in fields.items():
+            for g in _grams(s): self.postings[f + ":" + g].add(doc_id)
+        self.order.setdefault(doc_id, len(self.order))
+
+    def remove(self, doc_id):
+        with self.lock: self._remove(doc_id)
+
+    def _remove(self, doc_id):
+        fields = self.docs.pop(doc_id, None)
+        if fields is None: return
+        code = self.codes.pop(doc_id, None)
+        keys = ["code:" + code] if code else []
+        keys += [f + ":" + g for f, s in fields.items() for g in _grams(s)]
+        for k in keys:
+            ids = self.postings.get(k)
+            if ids is not None:
+                ids.discard(doc_id)
+                if not ids: del self.postings[k]
+
+    def sync(self, names, version=None):
+        # names: {id: 商品名} 或 Series; 只对新增 / 改名 / 删除的商品做增量更新
+        if version is not None and version == self.version: return
+        names = {k: normalize(v) for k, v in dict(names).items()}
+        with self.lock:
+            for doc_id in [d for d in self.docs if d not in names]: self._remove(doc_id)
+            for doc_id, text in names.items():
+                old = self.docs.get(doc_id)
+                if old is None or old["t"] != text: self._add(doc_id, text)
+            self.order = {doc_id: pos for pos, doc_id in enumerate(names)}
+            self.version = version
+
+    def _match_term(self, term):
+        # 返回 {id: 得分}; 同一词命中多个字段时取最高分
+        hits = {}
+        fields = ["t"] + (["p", "i"] if lazy_pinyin is not None and ASCII_WORD_RE.match(term) else [])
+        n_docs = max(len(self.docs), 1)
+        for f in fields:
+            grams = [f + ":" + g for g in _grams(term)]
+            sets = sorted((self.postings.get(g, set()) for g in grams), key=len)
+            if not sets or not sets[0]: continue
+            cand = set.intersection(*sets)
+            idf = 1.0 + (n_docs / (len(cand) + 1)) ** 0.5
+            for doc_id in cand:
+                text = self.docs[doc_id].get(f, "")
+                pos = text.find(term)
+                if pos < 0: continue
+                score = FIELD_WEIGHT[f] * idf * (1.5 if pos == 0 else 1.0)
+                if hits.get(doc_id, 0) < score: hits[doc_id] = score
+        for doc_id in self.postings.get("code:" + term, ()):
+            hits[doc_id] = hits.get(doc_id, 0) + 3.0
+        return hits
+
+    def search(self, query, limit=None):
+        # 多关键词 (空格分隔) 需全部命中, 按得分排序
+        terms = [t for t in normalize(query).split() if t]
+        if not terms: return []
+        with self.lock: return self._search(terms, limit)
+
+    def _search(self, terms, limit):
+        scores = None
+        for term in terms:
+            hits = self._match_term(term)
+            if scores is None: scores = hits
+            else: scores = {d: s + hits[d] for d, s in scores.items() if d in hits}
+            if not scores: return []
+        ranked = sorted(scores, key=lambda d: (-scores[d], self.order.get(d, 0)))
+        return ranked[:limit] if limit else ranked
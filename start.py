@@ -1,222 +1,207 @@
 import streamlit as st
 import pandas as pd
-import json
 import os
-import requests
 import time
-import glob
-import base64
-import re
 from PIL import Image
 from io import BytesIO
-
-# === 依赖检查 ===
-try:
-    from rembg import remove, new_session
-except ImportError:
-    st.error("❌ 缺少库，请运行: pip install --upgrade rembg[cli] pillow requests streamlit")
-    st.stop()
+import numpy as np
+from pricing import STRIPE_PCT, STRIPE_FIX, channel_names, sea_channel, ship_formula, load_rate_cards, calculate_sku_variant, price_catalog, price_skus, expand_skus, sensitivity_grid, grid_summary, flipped_skus, DIM_COLUMNS
+import catalog_store
+import thumbnails
+import image_store
+import cutout
+import rates
+import perf
+import bulk_import
+import supplier_fetch
+import marketplace_export
+from image_store import DB_IMG_FOLDER
 
 # === 全局设置 ===
-MASTER_DB_FILE = "product_database_master.csv" 
 DEFAULT_SAVE_PATH = os.path.join(os.path.expanduser("~"), "Desktop", "Product_Images")
-DB_IMG_FOLDER = "db_images"
-STRIPE_PCT = 0.034
-STRIPE_FIX = 0.50
+DEFAULT_EXPORT_PATH = os.path.join(os.path.expanduser("~"), "Desktop", "Product_Export")
+CATALOG_POLL_SECONDS = 5   # 多久检查一次其他窗口 / 脚本是否改了商品库
 
 if not os.path.exists(DB_IMG_FOLDER): os.makedirs(DB_IMG_FOLDER)
 
 # === 初始化 Session ===
-if 'rembg_session' not in st.session_state: st.session_state.rembg_session = new_session("isnet-general-use")
 if 'current_view' not in st.session_state: st.session_state.current_view = 'dashboard'
 if 'editing_index' not in st.session_state: st.session_state.editing_index = None
 if 'uploaded_files' not in st.session_state: st.session_state.uploaded_files = []
 if 'active_img_data' not in st.session_state: st.session_state.active_img_data = None
+perf.start_run(st.session_state.current_view)
+st.session_state.catalog_version = catalog_store.version()
+
+# 热点函数计时 (侧边栏 🐞 面板 + .cache/perf.jsonl)
+calculate_sku_variant = perf.timed("pricing.sku")(calculate_sku_variant)
+price_catalog = perf.timed("pricing.catalog")(price_catalog)
+sensitivity_grid = perf.timed("pricing.grid")(sensitivity_grid)
 
 # === 0. 数据核心 ===
-def load_data():
-    df = pd.DataFrame()
-    if os.path.exists(MASTER_DB_FILE):
-        try: df = pd.read_csv(MASTER_DB_FILE)
-        except: pass
-    elif glob.glob("product_database*.csv"):
-        latest = max(glob.glob("product_database*.csv"), key=os.path.getmtime)
-        try: df = pd.read_csv(latest)
-        except: pass
-    
-    if not df.empty:
-        df = df.fillna("")
-        if "图片路径" in df.columns:
-            df["图片路径"] = df["图片路径"].astype(str)
-            
-        cols_to_drop = ["删除", "Delete", "选择", "图片预览", "利润率"] 
-        df = df.drop(columns=[c for c in cols_to_drop if c in df.columns], errors='ignore')
-        
-        cols_check = ["目标利润率", "文案", "图片路径", "包装尺寸(cm)", "采购链接", "Shopee竞品链接", "数量", "真实售价", "SKU配置", "备注", "竞品价(SGD)"]
-        for col in cols_check:
-            if col not in df.columns:
-                if col == "数量": df[col] = 1
-                elif col == "真实售价": df[col] = 0.0
-                elif col == "竞品价(SGD)": df[col] = 0.0
-                else: df[col] = ""
+# 列表 / 推演只读这些列 (不含 文案 等长文本), 详情页仍读整行
+DASHBOARD_COLUMNS = ["图片路径", "商品", "数量", "重量", "进货价", "目标利润率", "广告占比", "包装尺寸(cm)",
+                     "空运售价(SGD)", "真实售价", "硬成本(RMB)", "竞品价(SGD)", "采购链接", "Shopee竞品链接"]
+
+@perf.timed("load_data")
+def load_data(columns=None):
+    # 进程级缓存, 按库的写入计数失效; 索引即商品 id
+    df = catalog_store.load_catalog(columns=columns)
+    perf.annotate(catalog_size=len(df))
     return df
 
-def save_data(df):
-    cols_to_drop = ["删除", "Delete", "选择", "图片预览"]
-    df_clean = df.drop(columns=[c for c in cols_to_drop if c in df.columns], errors='ignore')
-    df_clean.to_csv(MASTER_DB_FILE, index=False, encoding='utf-8-sig')
-
+@perf.timed("image_to_base64")
 def image_to_base64(image_path):
     if not image_path or not isinstance(image_path, str) or image_path == "nan": return None
     if image_path.startswith("http"): return image_path
-    if os.path.exists(image_path):
-        try:
-            with open(image_path, "rb") as f:
-                return f"data:image/png;base64,{base64.b64encode(f.read()).decode()}"
-        except: return None
-    return None
+    # 表格只需小图: 走持久化缩略图缓存, 而不是每次编码原图
+    return thumbnails.thumbnail_data_uri(image_path)
+
+def dashboard_frame():
+    # 首页表格底表 (含缩略图 data URI): 每个库版本构建一次, 经 catalog_store.derived 在各会话间共享
+    df = load_data(DASHBOARD_COLUMNS)
+    return df.assign(主图=df["图片路径"].map(image_to_base64)) if "图片路径" in df.columns else df
+
+@st.fragment(run_every=CATALOG_POLL_SECONDS)
+def watch_catalog():
+    # 其他会话 / 脚本改了商品库: 首页直接刷新; 编辑 / 推演页只提示, 不打断输入
+    v = catalog_store.version()
+    if v == st.session_state.catalog_version: return
+    st.session_state.catalog_version = v
+    if st.session_state.current_view == 'dashboard': st.rerun(scope="app")
+    else: st.toast("商品库已在其他窗口更新, 返回列表后刷新", icon="🔄")
+
+# === 详情页 SKU 草稿: 增删改都只在 session 里, 点 💾 保存所有修改 时一次写库 ===
+def sku_draft(pid, base_cost, base_profit):
+    draft = st.session_state.get("sku_draft")
+    if draft is None or draft["pid"] != pid:
+        items = catalog_store.load_skus(pid) or [{"name": "1件装", "qty": 1, "cost": base_cost, "profit": base_profit, "fixed_price": 0.0, "comp_price": 0.0}]
+        # uid 用作控件 key, 删除 / 新增后其余卡片的输入不会错位
+        for uid, sku in enumerate(items): sku["uid"] = uid
+        draft = st.session_state.sku_draft = {"pid": pid, "items": items, "next_uid": len(items)}
+    return draft
+
+def add_sku(draft, cost, profit):
+    draft["items"].append({"name": "新变体", "qty": 1, "cost": cost, "profit": profit, "fixed_price": 0.0, "comp_price": 0.0, "uid": draft["next_uid"]})
+    draft["next_uid"] += 1
+
+@st.fragment
+def sku_card(i, sku, ctx):
+    # 改本卡片的输入只重跑这个片段; 结果写回草稿 (sku 就是草稿里的 dict)
+    k = f"{ctx['pid']}_{sku['uid']}"
+    with st.container(border=True):
+        # 第一行：基础参数
+        c_s1, c_s2, c_s3 = st.columns([2, 1, 1.5])
+        with c_s1: s_name = st.text_input(f"SKU #{i+1}", value=sku.get("name", f"{sku.get('qty',1)}件装"), key=f"sn_{k}")
+        with c_s2: s_qty = st.number_input("数量", value=int(sku.get("qty",1)), min_value=1, key=f"sq_{k}")
+        with c_s3: s_cost = st.number_input("总进货(¥)", value=float(sku.get("cost", ctx['cost']*s_qty)), key=f"sc_{k}")
 
-# === 1. 辅助函数 ===
-def get_realtime_rate():
-    try:
-        headers = {'User-Agent': 'Mozilla/5.0'}
-        resp = requests.get("https://open.er-api.com/v6/latest/SGD", headers=headers, timeout=3)
-        return float(resp.json()['rates']['CNY'])
-    except: return 5.35
-
-def clean_taobao_image_url(url):
-    if not isinstance(url, str): return ""
-    match = re.search(r'(.*?\.jpg|.*?\.png|.*?\.jpeg)', url, re.IGNORECASE)
-    return match.group(1) if match else url
+        # 第二行：定价策略
+        c_s4, c_s5, c_s6 = st.columns([1.5, 1.5, 1.5])
+        with c_s4: s_profit = st.number_input("利润%", value=float(sku.get("profit", ctx['profit'])*100), step=5.0, key=f"sp_{k}")/100
+        with c_s5: s_fixed = st.number_input("手动定价(SGD)", value=float(sku.get("fixed_price", 0.0)), key=f"sf_{k}")
+        with c_s6: s_comp = st.number_input("竞品价(SGD)", value=float(sku.get("comp_price", 0.0)), key=f"cp_{k}")
 
-def extract_image_from_url(text_input):
-    if not text_input or not isinstance(text_input, str): return None, "无效输入"
-    match = re.search(r'https?://[^\s\u4e00-\u9fa5]+', text_input)
-    raw_url = match.group(0) if match else text_input
-    clean_url = clean_taobao_image_url(raw_url)
-    if any(clean_url.lower().endswith(ext) for ext in ['.jpg', '.jpeg', '.png', '.webp', '.heic']):
-        return clean_url, "直接链接"
-    try:
-        headers = {'User-Agent': 'Mozilla/5.0 (iPhone; CPU iPhone OS 16_6 like Mac OS X) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/16.6 Mobile/15E148 Safari/604.1'}
-        resp = requests.get(clean_url, headers=headers, timeout=5, allow_redirects=True)
-        soup = BeautifulSoup(resp.content, 'html.parser')
-        og_image = soup.find("meta", property="og:image")
-        if og_image and og_image.get("content"): 
-            return clean_taobao_image_url(og_image["content"]), "抓取成功"
-        return None, "未识别"
-    except Exception as e: return None, str(e)
-
-# === 2. 运费逻辑 (返回 费用 和 公式字符串) ===
-def get_ship_cost_cny(weight, channel):
-    w = weight
-    cw = max(w, 1.0)
-    
-    price_table = {
-        "空运普货 (Legion)": {"first": 40, "add": 23, "bulk": 21},
-        "空运敏感 (Legion)": {"first": 55, "add": 31, "bulk": 29.5},
-        "海运慢递 (ZTO)":    {"first": 30, "add": 10, "bulk": 10}
-    }
-    key = channel if channel in price_table else "海运慢递 (ZTO)"
-    p = price_table[key]
-    
-    cost = 0
-    formula = ""
-    
-    if w > 10:
-        cost = w * p['bulk']
-        formula = f"{w:.2f}kg × ¥{p['bulk']}"
-    else:
-        add_w = max(w - 1, 0)
-        cost = p['first'] + add_w * p['add']
-        formula = f"¥{p['first']}(首) + {add_w:.2f}kg × ¥{p['add']}"
-        
-    return cost, formula
+        # 计算
+        unit_c = s_cost / s_qty if s_qty > 0 else 0
+        res = calculate_sku_variant(unit_c, ctx['domestic'], ctx['weight'], s_qty, s_profit, ctx['ad'], ctx['rate'], ctx['channel'], manual_price=s_fixed if s_fixed > 0 else None, comp_price=s_comp, unit_volume=ctx['volume'])
 
-# === 3. SKU 深度计算函数 (新版) ===
-def calculate_sku_variant(unit_cost, domestic, unit_weight, qty, profit_pct, ad_pct, rate, air_channel, manual_price=None, comp_price=0.0):
-    # 1. 基础数据
-    total_goods_cny = unit_cost * qty
-    total_weight = unit_weight * qty
-    
-    # 2. 运费计算 (空运 & 海运)
-    ship_air_cny, ship_air_form = get_ship_cost_cny(total_weight, air_channel)
-    ship_sea_cny, ship_sea_form = get_ship_cost_cny(total_weight, "海运慢递 (ZTO)")
-    
-    # 3. 空运硬成本
-    hard_air_cny = total_goods_cny + domestic + ship_air_cny
-    hard_air_sgd = hard_air_cny / rate
-    
-    # 4. 建议售价倒推 (基于空运)
-    denom = 1 - STRIPE_PCT - ad_pct - profit_pct
-    if denom <= 0.01:
-        suggested_price = 0.0
-    else:
-        suggested_price = (hard_air_sgd + STRIPE_FIX) / denom
-        
-    # 5. 确定最终售价
-    final_price = manual_price if (manual_price is not None and manual_price > 0) else suggested_price
-    
-    # 6. 费用核算 (基于最终售价)
-    stripe_fee = final_price * STRIPE_PCT + STRIPE_FIX
-    ad_fee = final_price * ad_pct
-    total_fee = stripe_fee + ad_fee
-    
-    # 7. 空运利润
-    profit_air_sgd = final_price - hard_air_sgd - total_fee
-    profit_air_cny = profit_air_sgd * rate
-    margin_air = (profit_air_sgd / final_price) if final_price > 0 else 0
-    
-    # 8. 海运利润 (假设售价相同)
-    hard_sea_cny = total_goods_cny + domestic + ship_sea_cny
-    hard_sea_sgd = hard_sea_cny / rate
-    profit_sea_sgd = final_price - hard_sea_sgd - total_fee
-    profit_sea_cny = profit_sea_sgd * rate
-    margin_sea = (profit_sea_sgd / final_price) if final_price > 0 else 0
-    
-    # 9. 竞品对比
-    comp_status = ""
-    if comp_price > 0:
-        diff = final_price - comp_price
-        if diff > 0: comp_status = f"贵 S${diff:.2f}"
-        else: comp_status = f"便宜 S${abs(diff):.2f}"
-    
-    return {
-        "weight": total_weight,
-        "final_price": final_price,
-        "suggested_price": suggested_price,
-        "comp_status": comp_status,
-        "fees": {"stripe": stripe_fee, "ad": ad_fee},
-        "air": {
-            "ship_cny": ship_air_cny, "ship_form": ship_air_form,
-            "hard_cny": hard_air_cny, "hard_sgd": hard_air_sgd,
-            "profit_cny": profit_air_cny, "margin": margin_air
-        },
-        "sea": {
-            "ship_cny": ship_sea_cny, "ship_form": ship_sea_form,
-            "hard_cny": hard_sea_cny, "hard_sgd": hard_sea_sgd,
-            "profit_cny": profit_sea_cny, "margin": margin_sea
-        },
-        "goods_cny": total_goods_cny
-    }
+        if res:
+            # 结果栏
+            final_p = res['final_price']
+            st.info(f"💰 建议: S${res['suggested_price']:.2f} | 🟢 实际: S${final_p:.2f} | 🔥 净赚: ¥{res['air']['profit_cny']:.1f} | 📈 利润率: {res['air']['margin']*100:.1f}%")
+
+            if res['comp_status']:
+                color = "red" if "贵" in res['comp_status'] else "green"
+                st.caption(f"竞争力: :{color}[比竞品 {res['comp_status']}]")
+
+            # 详细计算过程
+            with st.expander("🧮 查看该 SKU 成本明细 (含海运对比)"):
+                tab_air, tab_sea = st.tabs(["✈️ 空运明细", "🚢 海运明细"])
+
+                with tab_air:
+                    st.markdown(f"**1. 运费 (总重 {res['weight']:.2f}kg)**")
+                    st.code(f"{ship_formula(res['weight'], ctx['channel'], res['volume'])} = ¥{res['air']['ship_cny']:.1f}")
+
+                    st.markdown("**2. 硬成本构成**")
+                    st.write(f"货¥{res['goods_cny']:.0f} + 国内¥{ctx['domestic']} + 国际¥{res['air']['ship_cny']:.1f} = ¥{res['air']['hard_cny']:.1f}")
+                    st.write(f"折合: S${res['air']['hard_sgd']:.2f} (汇率 {ctx['rate']})")
+
+                    st.markdown("**3. 费用扣除**")
+                    st.write(f"Stripe: S${res['fees']['stripe']:.2f} ({(final_p*STRIPE_PCT+STRIPE_FIX):.2f})")
+                    st.write(f"广告: S${res['fees']['ad']:.2f}")
+
+                    st.success(f"**4. 净利**: S${final_p} - 成本费用 = S${(res['air']['profit_cny']/ctx['rate']):.2f} (¥{res['air']['profit_cny']:.1f})")
+
+                with tab_sea:
+                    st.markdown(f"**1. 运费计算**")
+                    st.code(f"{ship_formula(res['weight'], sea_channel(), res['volume'])} = ¥{res['sea']['ship_cny']:.1f}")
+
+                    st.markdown(f"**2. 利润对比 (按售价 S${final_p} 测算)**")
+                    diff = res['sea']['profit_cny'] - res['air']['profit_cny']
+                    st.info(f"海运净赚: ¥{res['sea']['profit_cny']:.1f} | 利润率: {res['sea']['margin']*100:.1f}%")
+                    st.write(f"比空运多赚: ¥{diff:.1f}")
+
+
+    sku.update(name=s_name, qty=s_qty, cost=s_cost, profit=s_profit, fixed_price=s_fixed, comp_price=s_comp)
+
+# === 1. 辅助函数 ===
+def extract_image_from_url(text_input):
+    # 连接池 + 磁盘 HTTP 缓存 (ETag 重新验证); 批量抓取见 supplier_fetch.batch_fetch
+    return supplier_fetch.resolve(text_input)
 
 # === 页面配置 ===
 st.set_page_config(page_title="独立站工作站 v37.0", layout="wide")
 
+watch_catalog()
+
 # === 侧边栏 ===
 with st.sidebar:
     st.header("⚙️ 全局参数")
-    if 'rate' not in st.session_state: st.session_state.rate = get_realtime_rate()
+    # 汇率来自进程级缓存, 不等待网络; 过期时后台刷新
+    with perf.span("rate.get"): auto_rate = rates.get_rate()
+    same_rate = lambda a, b: b is not None and abs(a - b) < 1e-4   # 输入框按 4 位小数显示
+    if 'rate' not in st.session_state: st.session_state.rate = auto_rate
+    elif not same_rate(auto_rate, st.session_state.rate) and same_rate(st.session_state.get("global_rate", st.session_state.rate), st.session_state.rate):
+        # 用户没改过输入框: 跟上后台刷新到的汇率 (冷启动时的默认值也会被替换)
+        st.session_state.rate = auto_rate
+        st.session_state.pop("global_rate", None)
     col_r1, col_r2 = st.columns([3,1])
     with col_r1: exchange_rate_global = st.number_input("全局汇率", value=st.session_state.rate, format="%.4f", key="global_rate")
     with col_r2: 
-        if st.button("🔄"): st.session_state.rate = get_realtime_rate(); st.rerun()
+        if st.button("🔄"):
+            with perf.span("rate.refresh"): rates.refresh(wait=3)
+            st.session_state.rate = rates.get_rate()
+            st.session_state.pop("global_rate", None)
+            st.rerun()
+    rate_info = rates.status()
+    # 说明的是输入框里的值, 而不是进程缓存
+    manual_rate = not same_rate(exchange_rate_global, st.session_state.rate)
+    # 写库 / 导出上架前要求: 用户手动输入, 或输入框里就是有效期内的实时汇率 (不用默认值 / 过期缓存悄悄算)
+    rate_trusted = manual_rate or (rates.is_fresh(rate_info) and same_rate(exchange_rate_global, rate_info['rate']))
+    if manual_rate: rate_note = "手动输入"
+    elif rate_info['rate'] is None: rate_note = rates.describe_age(None)
+    elif not same_rate(exchange_rate_global, rate_info['rate']): rate_note = "已有新汇率, 下次操作时生效"
+    else: rate_note = rates.describe_age(rate_info['age'])
+    st.caption(f"汇率更新: {rate_note}" + (" · 刷新中…" if rate_info['refreshing'] else "") + (f" · ⚠️ {rate_info['error']}" if rate_info['error'] else ""))
     
     st.divider()
-    air_ch = st.selectbox("空运渠道", ("空运普货 (Legion)", "空运敏感 (Legion)"))
+    air_ch = st.selectbox("空运渠道", channel_names("air"))
+    card_info = load_rate_cards()[0]
+    st.caption(f"运费价目表 v{card_info['version']}" + (f" · {card_info['effective']} 起生效" if card_info.get('effective') else ""))
     dom_ship = st.number_input("国内运费", value=0.0)
     global_ad = st.number_input("默认广告占比 (%)", 0.0, 100.0, 0.0, step=1.0)
+    if st.button("📤 导出 CSV", help=f"写出 {catalog_store.MASTER_DB_FILE} 以兼容旧流程"):
+        st.toast(f"已导出 {catalog_store.export_csv()} 条商品", icon="✅")
+    if st.button("🌐 补全主图", help="按 采购链接 并发抓取缺图商品的主图"):
+        fetch_bar = st.progress(0.0)
+        with perf.span("supplier_fetch"):
+            fetched = supplier_fetch.backfill(dry_run=False, progress=lambda d, n, r: fetch_bar.progress(d / n, text=f"{d}/{n}"))
+        st.toast(f"补全 {sum(1 for r in fetched if r.path)}/{len(fetched)} 个商品主图", icon="🌐")
+    if st.button("🧪 情景分析", help="汇率 × 利润率 × 广告 × 渠道 整库测算"):
+        st.session_state.update(current_view='scenario'); st.rerun()
     st.divider()
     st.info("v37.0: 详情页 SKU 增加海运计算与 Stripe 明细。")
+    st.checkbox("🐞 性能调试面板", key="perf_debug", help="显示本次重跑各环节耗时")
 
 # ============================================================
 #  视图 1: 详情编辑页 (Detail View)
@@ -230,7 +215,8 @@ if st.session_state.current_view == 'detail':
         col_header_1, col_header_2 = st.columns([1, 6])
         with col_header_1:
             if st.button("⬅️ 返回列表"):
-                st.session_state.update(current_view='dashboard')
+                # 未保存的 SKU 草稿一并丢弃
+                st.session_state.update(current_view='dashboard', sku_draft=None)
                 st.rerun()
         with col_header_2:
             st.title(f"🛠️ 编辑详情: {row['商品']}")
@@ -242,17 +228,15 @@ if st.session_state.current_view == 'detail':
             st.subheader("🖼️ 商品主图")
             current_img_path = str(row.get('图片路径', ''))
             if current_img_path and current_img_path != "nan" and os.path.exists(current_img_path):
-                st.image(Image.open(current_img_path), use_column_width=True)
+                st.image(image_store.best_image(current_img_path, 800), use_column_width=True)
             else: st.info("暂无图片")
             
             with st.expander("更换主图"):
                 new_img = st.file_uploader("上传新图片", type=['jpg','png','webp'])
                 if new_img:
                     img_obj = Image.open(new_img)
-                    new_path = f"{DB_IMG_FOLDER}/{row['商品']}_{int(time.time())}.png"
-                    img_obj.save(new_path)
-                    df.at[row_idx, '图片路径'] = new_path
-                    save_data(df)
+                    new_path = image_store.save_image(img_obj)
+                    catalog_store.update_product(row_idx, {'图片路径': new_path})
                     st.success("图片已更新")
                     st.rerun()
             
@@ -267,13 +251,8 @@ if st.session_state.current_view == 'detail':
             with col_rate:
                 current_page_rate = st.number_input("💱 计算汇率", value=exchange_rate_global, format="%.4f", step=0.01)
 
-            def parse_pct(val): 
-                try: return float(str(val).replace('%','')) 
-                except: return 30.0
-            
-            old_dims = str(row.get('包装尺寸(cm)', '0x0x0')).split('x')
-            if len(old_dims) != 3: old_dims = [0, 0, 0]
-            l_val, w_val, h_val = [float(x) if str(x).replace('.','',1).isdigit() else 0.0 for x in old_dims]
+            # 百分比 / 尺寸已在载入时解析为数值 (catalog_store)
+            l_val, w_val, h_val = (float(row[c]) for c in DIM_COLUMNS)
 
             c1, c2 = st.columns(2)
             with c1:
@@ -288,10 +267,8 @@ if st.session_state.current_view == 'detail':
 
             with c2:
                 new_weight = st.number_input("单件实重 (kg)", value=float(row['重量']))
-                old_profit = parse_pct(row.get('目标利润率', 30))
-                old_ad = parse_pct(row.get('广告占比', 0))
-                new_profit = st.number_input("目标利润率 (%)", value=old_profit, step=1.0) / 100
-                new_ad = st.number_input("广告占比 (%)", value=old_ad, step=1.0) / 100
+                new_profit = st.number_input("目标利润率 (%)", value=float(row['目标利润率']), step=1.0) / 100
+                new_ad = st.number_input("广告占比 (%)", value=float(row['广告占比']), step=1.0) / 100
                 new_comp = st.number_input("竞品参考价 (SGD)", value=float(row.get('竞品价(SGD)', 0)))
             
             st.markdown("#### 📄 文案内容")
@@ -302,126 +279,110 @@ if st.session_state.current_view == 'detail':
             st.markdown("---")
             st.subheader("🛍️ SKU 变体定价")
             
-            try: sku_list = json.loads(str(row.get('SKU配置', '[]')))
-            except: sku_list = []
-            if not sku_list:
-                sku_list.append({"name": "1件装", "qty": 1, "cost": new_cost, "profit": new_profit, "fixed_price": 0.0, "comp_price": 0.0})
-
-            updated_sku_list = []
-            for i, sku in enumerate(sku_list):
-                with st.container(border=True):
-                    # 第一行：基础参数
-                    c_s1, c_s2, c_s3 = st.columns([2, 1, 1.5])
-                    with c_s1: s_name = st.text_input(f"SKU #{i+1}", value=sku.get("name", f"{sku.get('qty',1)}件装"), key=f"sn_{i}")
-                    with c_s2: s_qty = st.number_input("数量", value=int(sku.get("qty",1)), min_value=1, key=f"sq_{i}")
-                    with c_s3: s_cost = st.number_input("总进货(¥)", value=float(sku.get("cost", new_cost*s_qty)), key=f"sc_{i}")
-                    
-                    # 第二行：定价策略
-                    c_s4, c_s5, c_s6 = st.columns([1.5, 1.5, 1.5])
-                    with c_s4: s_profit = st.number_input("利润%", value=float(sku.get("profit", new_profit)*100), step=5.0, key=f"sp_{i}")/100
-                    with c_s5: s_fixed = st.number_input("手动定价(SGD)", value=float(sku.get("fixed_price", 0.0)), key=f"sf_{i}")
-                    with c_s6: s_comp = st.number_input("竞品价(SGD)", value=float(sku.get("comp_price", 0.0)), key=f"cp_{i}")
-                    
-                    # 计算
-                    unit_c = s_cost / s_qty if s_qty > 0 else 0
-                    res = calculate_sku_variant(unit_c, dom_ship, new_weight, s_qty, s_profit, new_ad, current_page_rate, air_ch, manual_price=s_fixed if s_fixed > 0 else None, comp_price=s_comp)
-                    
-                    if res:
-                        # 结果栏
-                        final_p = res['final_price']
-                        st.info(f"💰 建议: S${res['suggested_price']:.2f} | 🟢 实际: S${final_p:.2f} | 🔥 净赚: ¥{res['air']['profit_cny']:.1f} | 📈 利润率: {res['air']['margin']*100:.1f}%")
-                        
-                        if res['comp_status']:
-                            color = "red" if "贵" in res['comp_status'] else "green"
-                            st.caption(f"竞争力: :{color}[比竞品 {res['comp_status']}]")
-
-                        # 详细计算过程
-                        with st.expander("🧮 查看该 SKU 成本明细 (含海运对比)"):
-                            tab_air, tab_sea = st.tabs(["✈️ 空运明细", "🚢 海运明细"])
-                            
-                            with tab_air:
-                                st.markdown(f"**1. 运费 (总重 {res['weight']:.2f}kg)**")
-                                st.code(f"{res['air']['ship_form']} = ¥{res['air']['ship_cny']:.1f}")
-                                
-                                st.markdown("**2. 硬成本构成**")
-                                st.write(f"货¥{res['goods_cny']:.0f} + 国内¥{dom_ship} + 国际¥{res['air']['ship_cny']:.1f} = ¥{res['air']['hard_cny']:.1f}")
-                                st.write(f"折合: S${res['air']['hard_sgd']:.2f} (汇率 {current_page_rate})")
-                                
-                                st.markdown("**3. 费用扣除**")
-                                st.write(f"Stripe: S${res['fees']['stripe']:.2f} ({(final_p*0.034+0.5):.2f})")
-                                st.write(f"广告: S${res['fees']['ad']:.2f}")
-                                
-                                st.success(f"**4. 净利**: S${final_p} - 成本费用 = S${(res['air']['profit_cny']/current_page_rate):.2f} (¥{res['air']['profit_cny']:.1f})")
-
-                            with tab_sea:
-                                st.markdown(f"**1. 运费计算**")
-                                st.code(f"{res['sea']['ship_form']} = ¥{res['sea']['ship_cny']:.1f}")
-                                
-                                st.markdown(f"**2. 利润对比 (按售价 S${final_p} 测算)**")
-                                diff = res['sea']['profit_cny'] - res['air']['profit_cny']
-                                st.info(f"海运净赚: ¥{res['sea']['profit_cny']:.1f} | 利润率: {res['sea']['margin']*100:.1f}%")
-                                st.write(f"比空运多赚: ¥{diff:.1f}")
-                    
-                    updated_sku_list.append({
-                        "name": s_name, "qty": s_qty, "cost": s_cost, 
-                        "profit": s_profit, "fixed_price": s_fixed, "comp_price": s_comp
-                    })
+            draft = sku_draft(row_idx, new_cost, new_profit)
+            ctx = {"pid": row_idx, "cost": new_cost, "profit": new_profit, "weight": new_weight, "ad": new_ad, "rate": current_page_rate,
+                   "channel": air_ch, "domestic": dom_ship, "volume": nl*nw*nh}
+            for i, sku in enumerate(draft["items"]): sku_card(i, sku, ctx)
 
             col_add, col_del = st.columns(2)
-            with col_add:
-                if st.button("➕ 增加 SKU"):
-                    updated_sku_list.append({"name": "新变体", "qty": 1, "cost": new_cost, "profit": new_profit, "fixed_price": 0.0, "comp_price": 0.0})
-                    df.at[row_idx, 'SKU配置'] = json.dumps(updated_sku_list)
-                    save_data(df); st.rerun()
+            with col_add: st.button("➕ 增加 SKU", on_click=add_sku, args=(draft, new_cost, new_profit))
             with col_del:
-                if len(updated_sku_list) > 1:
-                    if st.button("➖ 删除末尾"):
-                        updated_sku_list.pop()
-                        df.at[row_idx, 'SKU配置'] = json.dumps(updated_sku_list)
-                        save_data(df); st.rerun()
+                if len(draft["items"]) > 1: st.button("➖ 删除末尾", on_click=draft["items"].pop)
+            st.caption("SKU 的增删改暂存在本页, 点击 💾 保存所有修改 后一次写入")
 
             # 底部按钮
             st.markdown("---")
             b1, b2 = st.columns([1, 5])
             with b1:
                 if st.button("🗑️ 删除商品"):
-                    df = df.drop(row_idx)
-                    save_data(df)
-                    st.session_state.current_view = 'dashboard'
+                    catalog_store.delete_product(row_idx)
+                    st.session_state.update(current_view='dashboard', sku_draft=None)
                     st.rerun()
             with b2:
                 if st.button("💾 保存所有修改", type="primary", use_container_width=True):
-                    if updated_sku_list:
-                        first = updated_sku_list[0]
+                    updates = {}
+                    sku_list = draft["items"]
+                    if sku_list:
+                        first = sku_list[0]
                         # 主表更新预览
-                        f_res = calculate_sku_variant(first['cost']/first['qty'] if first['qty']>0 else 0, dom_ship, new_weight, first['qty'], first['profit'], new_ad, current_page_rate, air_ch, manual_price=first['fixed_price'], comp_price=first.get('comp_price', 0.0))
+                        f_res = calculate_sku_variant(first['cost']/first['qty'] if first['qty']>0 else 0, dom_ship, new_weight, first['qty'], first['profit'], new_ad, current_page_rate, air_ch, manual_price=first['fixed_price'], comp_price=first.get('comp_price', 0.0), unit_volume=nl*nw*nh)
                         if f_res:
-                            df.at[row_idx, '空运售价(SGD)'] = round(f_res['suggested_price'], 2)
-                            df.at[row_idx, '真实售价'] = round(f_res['final_price'], 2)
-                            df.at[row_idx, '硬成本(RMB)'] = round(f_res['air']['hard_cny'], 2)
-                            df.at[row_idx, '竞品价(SGD)'] = first.get('comp_price', 0.0)
-
-                    df.at[row_idx, '商品'] = new_name
-                    df.at[row_idx, '重量'] = new_weight
-                    df.at[row_idx, '进货价'] = new_cost
-                    df.at[row_idx, '包装尺寸(cm)'] = f"{nl}x{nw}x{nh}"
-                    df.at[row_idx, '目标利润率'] = f"{new_profit*100}%"
-                    df.at[row_idx, '广告占比'] = f"{new_ad*100}%"
-                    df.at[row_idx, '文案'] = new_copy
-                    df.at[row_idx, '备注'] = new_note
-                    df.at[row_idx, '采购链接'] = new_sourcing_link
-                    df.at[row_idx, 'Shopee竞品链接'] = new_shopee_link
-                    df.at[row_idx, 'SKU配置'] = json.dumps(updated_sku_list)
-                    
-                    save_data(df)
+                            updates['空运售价(SGD)'] = round(f_res['suggested_price'], 2)
+                            updates['真实售价'] = round(f_res['final_price'], 2)
+                            updates['硬成本(RMB)'] = round(f_res['air']['hard_cny'], 2)
+                            updates['竞品价(SGD)'] = first.get('comp_price', 0.0)
+
+                    updates.update({
+                        '商品': new_name, '重量': new_weight, '进货价': new_cost,
+                        '包装尺寸(cm)': f"{nl}x{nw}x{nh}",
+                        '目标利润率': f"{new_profit*100}%", '广告占比': f"{new_ad*100}%",
+                        '文案': new_copy, '备注': new_note,
+                        '采购链接': new_sourcing_link, 'Shopee竞品链接': new_shopee_link
+                    })
+                    catalog_store.update_product(row_idx, updates, skus=sku_list)
                     st.toast("保存成功！", icon="✅")
                     time.sleep(0.5)
-                    st.session_state.current_view = 'dashboard'
+                    st.session_state.update(current_view='dashboard', sku_draft=None)
                     st.rerun()
     else:
         st.error("商品未找到")
         if st.button("返回"): st.session_state.update(current_view='dashboard'); st.rerun()
 
+# ============================================================
+#  视图 3: 情景分析 (Scenario View)
+# ============================================================
+elif st.session_state.current_view == 'scenario':
+    col_header_1, col_header_2 = st.columns([1, 6])
+    with col_header_1:
+        if st.button("⬅️ 返回列表"):
+            st.session_state.update(current_view='dashboard')
+            st.rerun()
+    with col_header_2:
+        st.title("🧪 情景分析: 汇率 × 利润率 × 广告 × 渠道")
+
+    c1, c2 = st.columns(2)
+    with c1:
+        rate_lo, rate_hi = st.slider("汇率区间 (SGD→CNY)", 4.0, 7.0, (round(exchange_rate_global - 0.3, 2), round(exchange_rate_global + 0.3, 2)), step=0.05)
+        rate_steps = st.number_input("汇率档数", 2, 50, 7)
+        channels = st.multiselect("渠道", channel_names(), default=[air_ch])
+    with c2:
+        margin_opts = st.multiselect("目标利润率 (%)", [5, 10, 15, 20, 25, 30, 40], default=[10, 15, 20, 30])
+        ad_opts = st.multiselect("广告占比 (%)", [0, 5, 10, 15, 20, 30], default=[0, 10])
+        use_fixed = st.checkbox("保留手动定价 (否则全部按目标利润率倒推售价)", value=True)
+
+    df_sc = load_data(DASHBOARD_COLUMNS)
+    if df_sc.empty or not channels:
+        st.info("暂无数据" if df_sc.empty else "请至少选择一个渠道")
+    else:
+        sc_rates = np.linspace(rate_lo, rate_hi, int(rate_steps)).round(4)
+        sc_margins = [m / 100 for m in sorted(margin_opts)] or None
+        sc_ads = [a / 100 for a in sorted(ad_opts)] or None
+        with perf.span("load_sku_frame"): sc_skus = expand_skus(df_sc, catalog_store.load_sku_frame())
+        grid = sensitivity_grid(sc_skus, sc_rates, sc_margins, sc_ads, channels, dom_ship, use_fixed)
+        summary = grid_summary(grid, sc_rates, sc_margins, sc_ads)
+        n_points = len(sc_skus) * len(summary)
+        st.caption(f"共 {len(sc_skus)} 个 SKU × {len(summary)} 个情景 = {n_points:,} 个测算点")
+
+        st.subheader("📉 各情景亏损 SKU 数")
+        sel_ch = st.selectbox("查看渠道", channels)
+        view = summary[summary['channel'] == sel_ch].copy()
+        view['广告'] = view['ad'].map(lambda v: "自身设置" if v is None else f"{v*100:.0f}%")
+        view['利润率'] = view['margin'].map(lambda v: "自身设置" if v is None else f"{v*100:.0f}%")
+        pivot = view.pivot_table(index='rate', columns=['广告', '利润率'], values='n_negative', aggfunc='sum')
+        st.dataframe(pivot, use_container_width=True)
+
+        st.subheader("⚠️ 会转为亏损的 SKU")
+        # 基准: 侧边栏当前汇率 / 渠道下各 SKU 自身设置的净赚; 已经亏损的不算 "转为亏损"
+        baseline = price_skus(sc_skus, exchange_rate_global, air_ch, dom_ship)['air_profit_cny']
+        flips = flipped_skus(sc_skus, grid, baseline, sc_rates, sc_margins, sc_ads)
+        if flips.empty: st.success("当前不亏损的 SKU 在所有情景下均不亏损")
+        else:
+            flips.insert(0, "商品", df_sc['商品'].reindex(flips['product']).to_numpy())
+            st.dataframe(flips.drop(columns=['product']), use_container_width=True, hide_index=True,
+                         column_config={"baseline_profit_cny": st.column_config.NumberColumn("当前净赚(¥)", format="%.1f"),
+                                        "worst_profit_cny": st.column_config.NumberColumn("最差净赚(¥)", format="%.1f"),
+                                        "n_negative": st.column_config.NumberColumn("亏损情景数")})
+
 # ============================================================
 #  视图 2: 首页工作台 (Dashboard)
 # ============================================================
@@ -435,13 +396,12 @@ else:
         
         with c_input:
             files = st.file_uploader("拖入图片 (批量)", type=['jpg','png','webp'], accept_multiple_files=True)
+            # 会话里只保留上传文件的引用, 不保存解码后的图片; 清空上传框后一并释放
+            st.session_state.uploaded_files = files or []
+            st.session_state.active_img_data = None
             if files:
-                st.session_state.uploaded_files = files
                 selected = st.selectbox("📸 选为主图:", [f.name for f in files])
-                for f in files:
-                    if f.name == selected:
-                        st.session_state.active_img_data = Image.open(f)
-                        break
+                st.session_state.active_img_data = next(f for f in files if f.name == selected)
         with c_prev:
             if st.session_state.active_img_data: st.image(st.session_state.active_img_data, width=150)
 
@@ -478,7 +438,7 @@ else:
                 st.markdown(f":{color}[比竞品 {res_pre['comp_status']}]")
                 
             with st.expander("📊 成本公式"):
-                st.write(f"运费: {res_pre['air']['ship_form']} = ¥{res_pre['air']['ship_cny']:.1f}")
+                st.write(f"运费: {ship_formula(res_pre['weight'], air_ch)} = ¥{res_pre['air']['ship_cny']:.1f}")
                 st.info(f"硬成本: S${res_pre['air']['hard_sgd']:.2f}")
 
         with col2: 
@@ -487,27 +447,43 @@ else:
             st.metric("海运净赚", f"¥{res_pre['sea']['profit_cny']:.1f}", delta=f"多赚 ¥{diff:.1f}")
             
             with st.expander("📊 成本公式"):
-                st.write(f"运费: {res_pre['sea']['ship_form']} = ¥{res_pre['sea']['ship_cny']:.1f}")
+                st.write(f"运费: {ship_formula(res_pre['weight'], sea_channel())} = ¥{res_pre['sea']['ship_cny']:.1f}")
 
         # 3. 批量抠图
         st.markdown("---")
         with st.expander("✂️ 批量抠图工具"):
+            # rembg / onnxruntime 仅在此处按需加载, 全进程共享一份模型
+            if not cutout.available():
+                st.error("❌ 缺少库，请运行: pip install --upgrade rembg[cli] pillow requests streamlit")
+            elif st.checkbox("后台预加载抠图模型", value=cutout.is_loaded()):
+                cutout.warm_up()
             save_path = st.text_input("保存路径", value=DEFAULT_SAVE_PATH)
             if st.button("🔥 开始批量抠图"):
                 files = st.session_state.uploaded_files
                 if not files: st.warning("请上传")
+                elif not cutout.available(): st.warning("请先安装 rembg")
                 else:
                     if not os.path.exists(save_path): os.makedirs(save_path)
                     bar = st.progress(0)
-                    for i, f in enumerate(files):
+                    items = []
+                    for f in files:
+                        f.seek(0); items.append((f.name, f.read()))
+                    # 少量图片在本进程内用共享模型, 大批量交给多进程池
+                    session = cutout.get_shared_session() if len(items) <= 2 else None
+                    errors = []
+                    with perf.span("cutout"):
                         try:
-                            f.seek(0); img = Image.open(f)
-                            out = remove(img, session=st.session_state.rembg_session)
-                            fname = f"{name if name else 'img'}_{i}_{int(time.time())}.png"
-                            out.save(os.path.join(save_path, fname), "PNG")
-                        except: pass
-                        bar.progress((i+1)/len(files))
-                    st.success("完成")
+                            for done, res in enumerate(cutout.batch_remove(items, session=session), 1):
+                                if res.error: errors.append(f"{res.name}: {res.error}")
+                                else:
+                                    fname = f"{name if name else 'img'}_{res.index}_{int(time.time())}.png"
+                                    with open(os.path.join(save_path, fname), "wb") as out: out.write(res.data)
+                                bar.progress(done/len(items), text=f"{done}/{len(items)} {res.name}")
+                        except Exception as e: errors.append(f"批处理中断: {e}")
+                    if errors:
+                        st.warning(f"完成 {len(items)-len(errors)}/{len(items)}，失败:")
+                        for err in errors: st.caption(f"❌ {err}")
+                    else: st.success("完成")
 
         # 4. 保存按钮
         st.markdown("---")
@@ -515,10 +491,8 @@ else:
             if name and cost > 0 and res_pre:
                 img_path = ""
                 if st.session_state.active_img_data:
-                    img_path = f"{DB_IMG_FOLDER}/{name}_{int(time.time())}.png"
-                    st.session_state.active_img_data.save(img_path)
+                    img_path = image_store.save_image(Image.open(BytesIO(st.session_state.active_img_data.getvalue())))
                 
-                df_curr = load_data()
                 default_sku = [{"name": f"{qty_in}件装", "qty": qty_in, "cost": cost*qty_in, "profit": profit_in, "fixed_price": real_price_in, "comp_price": comp_price}]
                 
                 new_row = {
@@ -531,47 +505,103 @@ else:
                     "硬成本(RMB)": round(res_pre['air']['hard_cny'], 2),
                     "竞品价(SGD)": comp_price, "文案": "", "备注": "", 
                     "采购链接": "", "Shopee竞品链接": "",
-                    "SKU配置": json.dumps(default_sku),
                     "时间": time.strftime("%m-%d %H:%M")
                 }
-                df_new = pd.concat([pd.DataFrame([new_row]), df_curr], ignore_index=True)
-                save_data(df_new)
+                catalog_store.insert_product(new_row, skus=default_sku)
                 st.success("已添加！")
                 st.rerun()
 
+    # 批量导入: 整表一次定价, 一个事务写入
+    with st.expander("📥 批量导入 (供应商表格 + 图片文件夹)"):
+        sheet = st.file_uploader("供应商表格", type=['csv', 'xlsx'], key="import_sheet")
+        img_dir = st.text_input("图片文件夹 (可选)", placeholder="图片列写文件名, 或按 商品名 / 开头编号 匹配文件名")
+        c_dry, c_go = st.columns(2)
+        import_mode = "dry" if c_dry.button("🔍 预检") else "apply" if c_go.button("📥 确认导入", type="primary") else None
+        if import_mode and not sheet: st.warning("请先上传表格")
+        elif import_mode == "apply" and not rate_trusted: st.warning("汇率未获取成功 (当前为默认值 / 过期缓存), 请点 🔄 刷新或手动输入汇率后再导入")
+        elif import_mode:
+            sheet.seek(0)
+            try:
+                with perf.span("bulk_import"):
+                    report = bulk_import.run_import(sheet, img_dir or None, exchange_rate_global, air_ch, dom_ship, dry_run=import_mode == "dry")
+            except Exception as e: report = None; st.error(f"导入失败: {e}")
+            if report:
+                m1, m2, m3, m4 = st.columns(4)
+                m1.metric("有效行", f"{report['valid']}/{report['rows']}")
+                m2.metric("错误", len(report['errors']))
+                m3.metric("图片 (不重复/新增)", f"{report['images']['unique']}/{report['images']['new']}")
+                m4.metric("耗时", f"{report['seconds']}s")
+                if report['errors']: st.dataframe(pd.DataFrame(report['errors']), hide_index=True, use_container_width=True)
+                if report['warnings']: st.dataframe(pd.DataFrame(report['warnings']), hide_index=True, use_container_width=True)
+                if len(report['preview']):
+                    st.dataframe(report['preview'][["商品", "进货价", "重量", "空运售价(SGD)", "真实售价", "实时净赚(¥)", "实时利润率"]], use_container_width=True)
+                if import_mode == "apply": st.success(f"已导入 {report['inserted']} 个商品")
+
+    # 上架导出: 逐行写 CSV, 图片逐个写进 ZIP, 直接落盘 (不经浏览器下载, 大库也不占内存)
+    with st.expander("📤 导出上架表格 (Shopee / 独立站 + 图片包)"):
+        export_dir = st.text_input("导出目录", value=DEFAULT_EXPORT_PATH)
+        c_lay, c_img = st.columns([2, 1])
+        layouts = c_lay.multiselect("表格格式", list(marketplace_export.LAYOUTS), default=list(marketplace_export.LAYOUTS))
+        with_images = c_img.checkbox("打包图片 (images.zip)", value=True)
+        export_clicked = st.button("📤 开始导出") and layouts
+        # 导出的售价直接上架: 汇率未获取成功且用户没手动输入时不导出
+        if export_clicked and not rate_trusted: st.warning("汇率未获取成功 (当前为默认值 / 过期缓存), 请点 🔄 刷新或手动输入汇率后再导出")
+        elif export_clicked:
+            try:
+                with perf.span("marketplace_export"):
+                    report = marketplace_export.run_export(export_dir, layouts, exchange_rate_global, air_ch, dom_ship, with_images)
+                st.success(" · ".join(f"{k}: {v} 行" for k, v in report["rows"].items()) + (f" · 图片 {report['images']} 张" if with_images else ""))
+                for path in report["files"]: st.caption(path)
+            except Exception as e: st.error(f"导出失败: {e}")
+
     # 5. 数据库列表
     st.markdown("---")
     st.subheader("📋 商品数据库")
     st.caption("💡 **单击表格中的任意一行**，进入详情编辑页。")
 
-    df_hist = load_data()
+    df_hist = catalog_store.derived("dashboard", dashboard_frame)
     if not df_hist.empty:
-        df_display = df_hist.copy()
-        if "图片路径" in df_display.columns:
-            df_display["主图"] = df_display["图片路径"].apply(image_to_base64)
-            cols = ["主图", "商品", "数量", "重量", "进货价", "目标利润率", "空运售价(SGD)", "真实售价", "硬成本(RMB)", "竞品价(SGD)", "文案", "采购链接", "Shopee竞品链接"]
+        df_display = df_hist  # 共享底表的浅拷贝, 加列不会影响其他会话
+        # 按侧边栏汇率/渠道整库重算 (取每个商品的首个 SKU)
+        with perf.span("load_sku_frame"): sku_frame = catalog_store.load_sku_frame()
+        live = price_catalog(df_hist, sku_frame, exchange_rate_global, air_ch, dom_ship)
+        live = live[live['sku_idx'] == 0].set_index('product')
+        df_display["实时净赚(¥)"] = live['air_profit_cny'].round(1)
+        df_display["实时利润率"] = (live['air_margin'] * 100).round(1)
+        if "主图" in df_display.columns:
+            cols = ["主图", "商品", "数量", "重量", "进货价", "目标利润率", "空运售价(SGD)", "真实售价", "实时净赚(¥)", "实时利润率", "硬成本(RMB)", "竞品价(SGD)", "采购链接", "Shopee竞品链接"]
             valid_cols = [c for c in cols if c in df_display.columns]
             df_display = df_display[valid_cols]
 
-        event = st.dataframe(
+        with perf.span("render_table"): event = st.dataframe(
             df_display,
             use_container_width=True,
             hide_index=True,
             column_config={
                 "主图": st.column_config.ImageColumn(width=60),
-                "文案": st.column_config.TextColumn(width="small"),
                 "采购链接": st.column_config.LinkColumn(display_text="采购"),
                 "Shopee竞品链接": st.column_config.LinkColumn(display_text="Shopee"),
+                "目标利润率": st.column_config.NumberColumn(format="%.1f%%"),
                 "真实售价": st.column_config.NumberColumn(format="$%.2f"),
-                "空运售价(SGD)": st.column_config.NumberColumn(label="建议售价", format="$%.2f")
+                "空运售价(SGD)": st.column_config.NumberColumn(label="建议售价", format="$%.2f"),
+                "实时利润率": st.column_config.NumberColumn(format="%.1f%%")
             },
             on_select="rerun", selection_mode="single-row"
         )
         
         if len(event.selection.rows) > 0:
-            st.session_state.editing_index = event.selection.rows[0]
+            st.session_state.editing_index = int(df_display.index[event.selection.rows[0]])
             st.session_state.current_view = 'detail'
             st.rerun()
-    else: st.info("暂无数据")
 
+        t_stats = thumbnails.stats()
+        st.caption(f"🖼️ 缩略图缓存命中率 {t_stats['hit_rate']*100:.0f}% · 占用 {t_stats['disk_bytes']/1024/1024:.1f} MB")
+    else: st.info("暂无数据")
 
+# === 性能面板 (脚本末尾, 本次重跑各环节耗时) ===
+perf_run = perf.finish_run()
+if st.session_state.get("perf_debug"):
+    with st.sidebar.expander(f"🐞 本次重跑 {perf_run.total*1000:.0f} ms", expanded=True):
+        st.caption(f"run {perf_run.run_id} · 视图 {perf_run.view} · {perf_run.meta.get('catalog_size', '-')} 个商品")
+        st.dataframe(pd.DataFrame(perf.span_rows(perf_run)), hide_index=True, use_container_width=True)
+        if perf.PERF_LOG_FILE: st.caption(f"日志: {perf.PERF_LOG_FILE}")
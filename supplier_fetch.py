@@ -0,0 +1,200 @@
+import os
+import re
+import sys
+import json
+import time
+import hashlib
+import argparse
+import threading
+from collections import namedtuple
+from html.parser import HTMLParser
+from urllib.parse import urljoin, urlsplit
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import requests
+from requests.adapters import HTTPAdapter
+import catalog_store
+import image_store
+
+# === 抓取设置 ===
+HTTP_CACHE_DIR = os.path.join(".cache", "http")
+USER_AGENT = 'Mozilla/5.0 (iPhone; CPU iPhone OS 16_6 like Mac OS X) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/16.6 Mobile/15E148 Safari/604.1'
+HTTP_TIMEOUT = 8
+MAX_WORKERS = 16
+PER_HOST_LIMIT = 4          # 同一域名同时最多几个请求, 避免被淘宝 / 1688 限流
+FRESH_SECONDS = 600         # 缓存在此时间内直接使用, 超过后带 ETag / Last-Modified 重新验证
+IMAGE_EXTS = ('.jpg', '.jpeg', '.png', '.webp', '.heic')
+URL_RE = re.compile(r'https?://[^\s一-龥]+')
+
+Response = namedtuple("Response", "url status content content_type from_cache")
+FetchResult = namedtuple("FetchResult", "index link image_url path status error")
+
+# === 1. 连接池: 每个线程一个 Session (复用 TCP / TLS), 每个域名一个并发闸门 ===
+_local = threading.local()
+_host_lock = threading.Lock()
+_host_slots = {}
+
+def _session():
+    s = getattr(_local, "session", None)
+    if s is None:
+        s = _local.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=8, pool_maxsize=PER_HOST_LIMIT)
+        s.mount("http://", adapter)
+        s.mount("https://", adapter)
+        s.headers["User-Agent"] = USER_AGENT
+    return s
+
+def _host_slot(url):
+    host = urlsplit(url).netloc.lower()
+    with _host_lock:
+        if host not in _host_slots: _host_slots[host] = threading.BoundedSemaphore(PER_HOST_LIMIT)
+        return _host_slots[host]
+
+# === 2. 磁盘 HTTP 缓存 (<sha1>.json 元数据 + <sha1>.body 内容) ===
+def _cache_paths(url, cache_dir):
+    key = hashlib.sha1(url.encode("utf-8")).hexdigest()
+    return os.path.join(cache_dir, key + ".json"), os.path.join(cache_dir, key + ".body")
+
+def _read_cache(url, cache_dir):
+    meta_path, body_path = _cache_paths(url, cache_dir)
+    try:
+        with open(meta_path, encoding="utf-8") as f: meta = json.load(f)
+        with open(body_path, "rb") as f: return meta, f.read()
+    except (OSError, ValueError): return None, None
+
+def _write_cache(url, meta, body, cache_dir):
+    meta_path, body_path = _cache_paths(url, cache_dir)
+    os.makedirs(cache_dir, exist_ok=True)
+    suffix = f".{threading.get_ident()}.tmp"
+    if body is not None:
+        with open(body_path + suffix, "wb") as f: f.write(body)
+        os.replace(body_path + suffix, body_path)
+    with open(meta_path + suffix, "w", encoding="utf-8") as f: json.dump(meta, f)
+    os.replace(meta_path + suffix, meta_path)
+
+def fetch(url, cache_dir=HTTP_CACHE_DIR, fresh=None, timeout=HTTP_TIMEOUT):
+    # 新鲜缓存直接返回; 否则条件请求, 304 沿用缓存内容
+    meta, body = _read_cache(url, cache_dir)
+    if meta and time.time() - meta["fetched_at"] < (FRESH_SECONDS if fresh is None else fresh):
+        return Response(meta["final_url"], meta["status"], body, meta["content_type"], True)
+    headers = {}
+    if meta and meta.get("etag"): headers["If-None-Match"] = meta["etag"]
+    if meta and meta.get("last_modified"): headers["If-Modified-Since"] = meta["last_modified"]
+    with _host_slot(url):
+        resp = _session().get(url, headers=headers, timeout=timeout, allow_redirects=True)
+    if resp.status_code == 304 and meta:
+        meta["fetched_at"] = time.time()
+        _write_cache(url, meta, None, cache_dir)
+        return Response(meta["final_url"], meta["status"], body, meta["content_type"], True)
+    resp.raise_for_status()
+    meta = {"url": url, "final_url": resp.url, "status": resp.status_code, "fetched_at": time.time(),
+            "etag": resp.headers.get("ETag"), "last_modified": resp.headers.get("Last-Modified"),
+            "content_type": resp.headers.get("Content-Type", "")}
+    _write_cache(url, meta, resp.content, cache_dir)
+    return Response(resp.url, resp.status_code, resp.content, meta["content_type"], False)
+
+# === 3. 页面解析: og:image / twitter:image / image_src, 都没有时取第一张商品图 ===
+class _ImageMetaParser(HTMLParser):
+    KEYS = ("og:image", "og:image:url", "twitter:image", "image")
+
+    def __init__(self):
+        super().__init__()
+        self.meta, self.first_img = {}, None
+
+    def handle_starttag(self, tag, attrs):
+        a = {k.lower(): v for k, v in attrs if v}
+        if tag == "meta":
+            key = (a.get("property") or a.get("name") or a.get("itemprop") or "").lower()
+            if key in self.KEYS and a.get("content"): self.meta.setdefault(key, a["content"])
+        elif tag == "link" and a.get("rel", "").lower() == "image_src" and a.get("href"):
+            self.meta.setdefault("image_src", a["href"])
+        elif tag == "img" and self.first_img is None:
+            src = a.get("data-src") or a.get("src") or ""
+            if clean_taobao_image_url(src).lower().endswith(IMAGE_EXTS): self.first_img = src
+
+def clean_taobao_image_url(url):
+    # 去掉 _400x400.jpg / .webp 之类的缩放后缀, 取原图
+    if not isinstance(url, str): return ""
+    match = re.search(r'(.*?\.jpg|.*?\.png|.*?\.jpeg)', url, re.IGNORECASE)
+    return match.group(1) if match else url
+
+def find_image_url(html, base_url=""):
+    p = _ImageMetaParser()
+    try: p.feed(html if isinstance(html, str) else html.decode("utf-8", "replace"))
+    except Exception: pass
+    for key in _ImageMetaParser.KEYS + ("image_src",):
+        if key in p.meta: return clean_taobao_image_url(urljoin(base_url, p.meta[key]))
+    return clean_taobao_image_url(urljoin(base_url, p.first_img)) if p.first_img else None
+
+def resolve(text, cache_dir=HTTP_CACHE_DIR):
+    # 文本 (可夹带中文) → (图片直链, 说明); 与 extract_image_from_url 的返回一致
+    if not text or not isinstance(text, str): return None, "无效输入"
+    match = URL_RE.search(text)
+    url = clean_taobao_image_url(match.group(0) if match else text.strip())
+    if url.lower().endswith(IMAGE_EXTS): return url, "直接链接"
+    try: page = fetch(url, cache_dir)
+    except Exception as e: return None, str(e)
+    if page.content_type.startswith("image/"): return page.url, "直接链接"
+    img = find_image_url(page.content, page.url)
+    return (img, "抓取成功") if img else (None, "未识别")
+
+# === 4. 下载进图片库 (image_store.ingest: 规范化 + 内容寻址 + 尺寸图) ===
+def download_image(url, folder=image_store.DB_IMG_FOLDER, cache_dir=HTTP_CACHE_DIR):
+    return image_store.ingest(fetch(url, cache_dir).content, folder)
+
+def _resolve_one(index, link, download, folder, cache_dir):
+    img_url, status = resolve(link, cache_dir)
+    if not img_url: return FetchResult(index, link, None, None, status, status)
+    if not download: return FetchResult(index, link, img_url, None, status, None)
+    try: return FetchResult(index, link, img_url, download_image(img_url, folder, cache_dir), status, None)
+    except Exception as e: return FetchResult(index, link, img_url, None, status, f"下载失败: {e}")
+
+def iter_fetch(links, download=True, workers=MAX_WORKERS, folder=image_store.DB_IMG_FOLDER, cache_dir=HTTP_CACHE_DIR):
+    # links: [(index, 链接文本)] 或 {index: 链接文本}; 按完成顺序产出 FetchResult
+    items = list(links.items() if isinstance(links, dict) else links)
+    if not items: return
+    with ThreadPoolExecutor(min(workers, len(items))) as ex:
+        futures = [ex.submit(_resolve_one, i, link, download, folder, cache_dir) for i, link in items]
+        for fut in as_completed(futures): yield fut.result()
+
+def _input_order(items):
+    # 按输入位置排序 (index 可以是任意标签, 不能按字符串比较: "10" < "2")
+    pos = {i: n for n, (i, _) in enumerate(items)}
+    return lambda r: pos[r.index]
+
+def batch_fetch(links, **kwargs):
+    items = list(links.items() if isinstance(links, dict) else links)
+    return sorted(iter_fetch(items, **kwargs), key=_input_order(items))
+
+# === 5. 为缺图商品补主图 (按 采购链接) ===
+def missing_image_links(db_path=catalog_store.CATALOG_DB_FILE):
+    df = catalog_store.load_catalog(db_path, columns=["图片路径", "采购链接"])
+    if df.empty or "采购链接" not in df.columns: return {}
+    paths = df["图片路径"].map(image_store.normalize_path) if "图片路径" in df.columns else ""
+    missing = df[(df["采购链接"].astype(str).str.contains("http")) & ~paths.map(lambda p: bool(p) and os.path.exists(p))]
+    return dict(zip(missing.index.astype(int), missing["采购链接"].astype(str)))
+
+def backfill(db_path=catalog_store.CATALOG_DB_FILE, dry_run=True, progress=None, **kwargs):
+    links = missing_image_links(db_path)
+    results = []
+    for done, r in enumerate(iter_fetch(links, download=not dry_run, **kwargs), 1):
+        results.append(r)
+        if progress: progress(done, len(links), r)
+    updates = {r.index: {"图片路径": r.path} for r in results if r.path}
+    if updates: catalog_store.update_many(updates, db_path)
+    return sorted(results, key=_input_order(links.items()))
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="批量解析采购链接主图")
+    parser.add_argument("links", nargs="*", help="链接; 不填则处理库中缺图且有 采购链接 的商品")
+    parser.add_argument("--workers", type=int, default=MAX_WORKERS)
+    parser.add_argument("--apply", action="store_true", help="下载进 db_images 并写回 图片路径 (默认仅解析)")
+    parser.add_argument("--db", default=catalog_store.CATALOG_DB_FILE)
+    args = parser.parse_args(argv)
+    if args.links: results = batch_fetch(list(enumerate(args.links)), download=args.apply, workers=args.workers)
+    else: results = backfill(args.db, dry_run=not args.apply, workers=args.workers)
+    for r in results: print(f"{r.index}\t{'❌ ' + r.error if r.error else r.path or r.image_url}\t{r.link[:80]}")
+    print(f"{sum(1 for r in results if not r.error)}/{len(results)} 成功", file=sys.stderr)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,107 @@
+import os
+import base64
+import hashlib
+import threading
+from collections import OrderedDict
+from io import BytesIO
+from PIL import Image
+import image_store
+
+# === 缓存设置 ===
+THUMB_DIR = os.path.join(".cache", "thumbs")
+THUMB_SIZE = (120, 120)               # 表格列宽 60px, 按 2x 屏幕生成
+CARD_SIZE = (360, 360)                # 画廊卡片 (4 列)
+MAX_DISK_BYTES = 64 * 1024 * 1024     # 磁盘上限, 超出按 LRU 淘汰
+MAX_MEM_ITEMS = 2000                  # 进程内 data URI 缓存条数
+
+_lock = threading.Lock()
+_mem = OrderedDict()
+_disk_bytes = None
+_stats = {"mem_hits": 0, "disk_hits": 0, "variant_hits": 0, "misses": 0}
+
+# === 1. 缓存键: 路径 + mtime + 文件大小 (换图后自动失效) ===
+def _cache_key(image_path, size):
+    st = os.stat(image_path)
+    raw = f"{os.path.abspath(image_path)}|{st.st_mtime_ns}|{st.st_size}|{size[0]}x{size[1]}"
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+def _scan_disk():
+    total = 0
+    if os.path.isdir(THUMB_DIR):
+        for e in os.scandir(THUMB_DIR):
+            if e.is_file(): total += e.stat().st_size
+    return total
+
+def _evict(incoming):
+    # 按最近访问时间 (mtime, 命中时刷新) 淘汰最旧的缩略图
+    global _disk_bytes
+    if _disk_bytes is None: _disk_bytes = _scan_disk()
+    _disk_bytes += incoming
+    if _disk_bytes <= MAX_DISK_BYTES: return
+    entries = sorted((e for e in os.scandir(THUMB_DIR) if e.is_file()), key=lambda e: e.stat().st_mtime)
+    for e in entries:
+        if _disk_bytes <= MAX_DISK_BYTES * 0.9: break
+        try:
+            size = e.stat().st_size
+            os.remove(e.path)
+            _disk_bytes -= size
+        except OSError: pass
+
+def _render(image_path, size):
+    with Image.open(image_path) as img:
+        img.thumbnail(size)
+        if img.mode not in ("RGB", "RGBA"): img = img.convert("RGBA")
+        buf = BytesIO()
+        img.save(buf, "WEBP", quality=80)
+    return buf.getvalue()
+
+# === 2. 对外接口 ===
+def thumbnail_path(image_path, size=THUMB_SIZE):
+    if not image_path or not os.path.exists(image_path): return None
+    # 图片库中的图直接用入库时生成的 WebP 尺寸图 (旧图首次访问时补生成)
+    stored = image_store.best_image(image_path, max(size))
+    if stored != image_path:
+        with _lock: _stats["variant_hits"] += 1
+        return stored
+    key = _cache_key(image_path, size)
+    path = os.path.join(THUMB_DIR, key + ".webp")
+    with _lock:
+        if os.path.exists(path):
+            _stats["disk_hits"] += 1
+            try: os.utime(path)
+            except OSError: pass
+            return path
+        _stats["misses"] += 1
+    data = _render(image_path, size)
+    os.makedirs(THUMB_DIR, exist_ok=True)
+    tmp = f"{path}.{threading.get_ident()}.tmp"
+    with open(tmp, "wb") as f: f.write(data)
+    os.replace(tmp, path)
+    with _lock: _evict(len(data))
+    return path
+
+def thumbnail_data_uri(image_path, size=THUMB_SIZE):
+    if not image_path or not os.path.exists(image_path): return None
+    try:
+        key = _cache_key(image_path, size)
+        with _lock:
+            if key in _mem:
+                _mem.move_to_end(key)
+                _stats["mem_hits"] += 1
+                return _mem[key]
+        path = thumbnail_path(image_path, size)
+        with open(path, "rb") as f:
+            uri = f"data:image/webp;base64,{base64.b64encode(f.read()).decode()}"
+    except Exception: return None
+    with _lock:
+        _mem[key] = uri
+        if len(_mem) > MAX_MEM_ITEMS: _mem.popitem(last=False)
+    return uri
+
+def stats():
+    with _lock:
+        s = dict(_stats)
+        s["disk_bytes"] = _disk_bytes if _disk_bytes is not None else _scan_disk()
+    hits = s["mem_hits"] + s["disk_hits"] + s["variant_hits"]
+    s["hit_rate"] = hits / (hits + s["misses"]) if hits + s["misses"] else 0.0
+    return s